@@ -0,0 +1,112 @@
+"""Reading and writing single values through descriptors."""
+
+from lxml import etree
+
+import xmlmapper as mp
+
+from benchmarks import documents
+
+
+def _records(params, cache):
+    model = documents.record_model(params.depth)
+    feed = etree.fromstring(documents.make_document(params.records,
+                                                    params.depth,
+                                                    params.items))
+    return [model(elem, cache=cache) for elem in feed]
+
+
+def bench_node_value_read(params):
+    records = _records(params, cache=False)
+    return lambda: [record.name for record in records]
+
+
+def bench_node_value_read_cached(params):
+    records = _records(params, cache=True)
+    return lambda: [record.name for record in records]
+
+
+def bench_attribute_value_read(params):
+    records = _records(params, cache=False)
+    return lambda: [record.ident for record in records]
+
+
+def bench_attribute_value_read_cached(params):
+    records = _records(params, cache=True)
+    return lambda: [record.ident for record in records]
+
+
+def bench_all_fields_first_read(params):
+    model = documents.record_model(params.depth)
+    feed = etree.fromstring(documents.make_document(params.records,
+                                                    params.depth,
+                                                    params.items))
+
+    def read_all():
+        for elem in feed:
+            record = model(elem)
+            (record.ident, record.status, record.name, record.price)
+
+    return read_all
+
+
+def bench_to_dict(params):
+    model = documents.record_model(params.depth)
+    feed = etree.fromstring(documents.make_document(params.records,
+                                                    params.depth,
+                                                    params.items))
+    return lambda: [model(elem).to_dict() for elem in feed]
+
+
+def bench_load_many(params):
+    model = documents.record_model(params.depth)
+    feed = etree.fromstring(documents.make_document(params.records,
+                                                    params.depth,
+                                                    params.items))
+    return lambda: model.load_many(feed, as_tuples=True)
+
+
+def bench_columns(params):
+    model = documents.record_model(params.depth)
+    feed = etree.fromstring(documents.make_document(params.records,
+                                                    params.depth,
+                                                    params.items))
+    fields = ['ident', 'price']
+    return lambda: mp.columns(model, feed, fields=fields)
+
+
+def bench_build_many(params):
+    model = documents.record_model(params.depth)
+    rows = [{'name': 'name', 'price': 1.5}] * params.records
+    return lambda: model.build_many(rows)
+
+
+def bench_node_value_write(params):
+    records = _records(params, cache=False)
+
+    def write():
+        for record in records:
+            record.name = 'new name'
+
+    return write
+
+
+def bench_attribute_value_write(params):
+    records = _records(params, cache=True)
+
+    def write():
+        for record in records:
+            record.status = 'inactive'
+
+    return write
+
+
+def bench_node_value_create(params):
+    model = documents.record_model(params.depth)
+
+    def create():
+        for ind in range(params.records):
+            record = model()
+            record.name = 'name'
+            record.price = 1.5
+
+    return create
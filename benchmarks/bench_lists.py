@@ -0,0 +1,81 @@
+"""List view iteration and mutation."""
+
+from benchmarks import documents
+
+
+def _record(params, items):
+    model = documents.record_model(params.depth)
+    return model(documents.make_record(0, params.depth, items))
+
+
+def bench_list_iterate(params):
+    record = _record(params, params.records)
+    return lambda: list(record.items)
+
+
+def bench_list_index(params):
+    record = _record(params, params.records)
+
+    def index():
+        items = record.items
+        for ind in range(len(items)):
+            items[ind]
+
+    return index
+
+
+def bench_list_insert_delete(params):
+    record = _record(params, params.records)
+    middle = params.records // 2
+
+    def insert_delete():
+        items = record.items
+        for ind in range(100):
+            items.insert(middle, 'new item')
+            del items[middle]
+
+    return insert_delete
+
+
+def bench_list_assign(params):
+    record = _record(params, 0)
+    values = ['item {0}'.format(ind) for ind in range(params.records)]
+
+    def assign():
+        record.items = values
+
+    return assign
+
+
+def bench_list_extend(params):
+    values = ['item {0}'.format(ind) for ind in range(params.records)]
+
+    def extend():
+        record = _record(params, 0)
+        record.items.extend(values)
+
+    return extend
+
+
+def bench_list_append(params):
+    values = ['item {0}'.format(ind) for ind in range(params.records)]
+
+    def append():
+        record = _record(params, 0)
+        items = record.items
+        for value in values:
+            items.append(value)
+
+    return append
+
+
+def bench_list_contains(params):
+    record = _record(params, params.records)
+    return lambda: 'missing item' in record.items
+
+
+def bench_list_element_scan(params):
+    """Baseline: scanning the same children with plain lxml."""
+    record = _record(params, params.records)
+    items_elem = record._etree.find('items')
+    return lambda: [elem.get('name') for elem in items_elem.iter('item')]
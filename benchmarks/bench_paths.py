@@ -0,0 +1,57 @@
+"""Path creation and path DSL class definition."""
+
+from lxml import etree
+
+import xmlmapper as mp
+from benchmarks import documents
+
+
+def bench_make_path_deep(params):
+    path = documents.nested_path(params.depth * 5, 'leaf[@kind="deep"]')
+
+    def make_paths():
+        for ind in range(100):
+            mp.make_path(path, etree.Element('root'))
+
+    return make_paths
+
+
+def bench_make_path_existing(params):
+    path = documents.nested_path(params.depth * 5)
+    root = etree.Element('root')
+    mp.make_path(path, root)
+
+    def make_paths():
+        for ind in range(100):
+            mp.make_path(path, root)
+
+    return make_paths
+
+
+def bench_path_dsl_class_definition(params):
+    def define():
+        for ind in range(10):
+            documents.path_record_model(params.depth)
+
+    return define
+
+
+def bench_path_dsl_wide_class_definition(params):
+    def define():
+        attrs = {'ROOT_ELEM': 'record'}
+        for ind in range(100):
+            group = getattr(mp.ROOT, 'group{0}'.format(ind % 10))
+            attrs['field{0}'.format(ind)] = getattr(
+                group, 'field{0}'.format(ind))['value'] % (int, str)
+
+        type('WideModel', (mp.Model,), attrs)
+
+    return define
+
+
+def bench_core_class_definition(params):
+    def define():
+        for ind in range(10):
+            documents.record_model(params.depth)
+
+    return define
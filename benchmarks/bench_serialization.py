@@ -0,0 +1,115 @@
+"""Parsing and serializing whole documents."""
+
+import io
+
+from lxml import etree
+
+import xmlmapper as mp
+from benchmarks import documents
+
+
+class Feed(mp.Model):
+    ROOT_ELEM = 'feed'
+
+
+class SparseFeed(mp.Model):
+    ROOT_ELEM = 'feed'
+
+    first_price = mp.NodeValue('record/price', loads=float)
+
+
+def _document(params):
+    return documents.make_document(params.records, params.depth,
+                                   params.items)
+
+
+def bench_to_xml(params):
+    feed = Feed(etree.fromstring(_document(params)))
+    return feed.to_xml
+
+
+def bench_str(params):
+    feed = Feed(etree.fromstring(_document(params)))
+    return lambda: str(feed)
+
+
+def bench_str_cached(params):
+    feed = Feed(etree.fromstring(_document(params)), cache=True)
+    return lambda: str(feed)
+
+
+def bench_from_bytes(params):
+    data = _document(params)
+    return lambda: Feed.from_bytes(data)
+
+
+def bench_from_bytes_projected(params):
+    data = _document(params)
+    return lambda: SparseFeed.from_bytes(data, project=True)
+
+
+def bench_from_string(params):
+    data = _document(params).decode('utf-8')
+    return lambda: Feed(data)
+
+
+def bench_iterparse(params):
+    data = _document(params)
+    model = documents.record_model(params.depth)
+
+    def iterparse():
+        for record in model.iterparse(io.BytesIO(data)):
+            record.name
+
+    return iterparse
+
+
+def _one_in_ten(ident):
+    return ident % 10 == 0
+
+
+def bench_iterparse_filtered(params):
+    data = _document(params)
+    model = documents.record_model(params.depth)
+
+    def iterparse():
+        for record in model.iterparse(io.BytesIO(data)):
+            if _one_in_ten(record.ident):
+                record.name
+
+    return iterparse
+
+
+def bench_iterparse_where(params):
+    data = _document(params)
+    model = documents.record_model(params.depth)
+
+    def iterparse():
+        for record in model.iterparse(io.BytesIO(data),
+                                      where={'ident': _one_in_ten}):
+            record.name
+
+    return iterparse
+
+
+def bench_model_writer(params):
+    model = documents.record_model(params.depth)
+    records = [model(documents.make_record(ind, params.depth, params.items))
+               for ind in range(params.records)]
+
+    def write():
+        with mp.ModelWriter(io.BytesIO(), 'feed') as writer:
+            writer.write_all(records)
+
+    return write
+
+
+def bench_dedup_records(params):
+    class Record(documents.record_model(params.depth)):
+        STRUCTURAL_EQ = True
+
+    # every record appears twice, from separately parsed trees
+    records = [Record(documents.make_record(ind % (params.records // 2 or 1),
+                                            params.depth, params.items))
+               for ind in range(params.records)]
+    return lambda: set(records)
@@ -0,0 +1,70 @@
+"""Synthetic documents and models used by the benchmarks."""
+
+from lxml import etree
+
+import xmlmapper as mp
+from xmlmapper import xml_helpers as xh
+
+
+def nested_path(depth, leaf='name'):
+    return '/'.join(['level{0}'.format(i) for i in range(depth)] + [leaf])
+
+
+def make_record(ind, depth=3, items=10):
+    record = etree.Element('record', id=str(ind), status='active')
+
+    parent = record
+    for level in range(depth):
+        parent = etree.SubElement(parent, 'level{0}'.format(level))
+
+    etree.SubElement(parent, 'name').text = 'record {0}'.format(ind)
+    etree.SubElement(record, 'price').text = str(ind * 1.5)
+
+    item_list = etree.SubElement(record, 'items')
+    for item_ind in range(items):
+        etree.SubElement(item_list, 'item', name='item {0}'.format(item_ind))
+        etree.SubElement(item_list, 'note').text = 'not an item'
+
+    return record
+
+
+def make_document(records=1000, depth=3, items=10):
+    """Builds a feed of `records` records as bytes."""
+    feed = etree.Element('feed')
+    for ind in range(records):
+        feed.append(make_record(ind, depth, items))
+
+    return etree.tostring(feed)
+
+
+def record_model(depth=3):
+    class Record(mp.Model):
+        ROOT_ELEM = 'record'
+
+        ident = mp.AttributeValue('.', 'id', loads=int)
+        status = mp.AttributeValue('.', 'status')
+        name = mp.NodeValue(nested_path(depth))
+        price = mp.NodeValue('price', loads=float)
+        items = mp.NodeValueListView('items', 'item',
+                                     xh.attr_loader('name'),
+                                     xh.attr_dumper('name'))
+
+    return Record
+
+
+def path_record_model(depth=3):
+    name_path = mp.ROOT
+    for level in range(depth):
+        name_path = getattr(name_path, 'level{0}'.format(level))
+
+    class PathRecord(mp.Model):
+        ROOT_ELEM = 'record'
+
+        ident = mp.ROOT['id'] % (int, str)
+        status = mp.ROOT['status']
+        name = name_path.name
+        price = mp.ROOT.price % (float, str)
+        items = mp.ROOT.items[...].item % (xh.attr_loader('name'),
+                                           xh.attr_dumper('name'))
+
+    return PathRecord
@@ -0,0 +1,144 @@
+"""Runs the benchmarks, optionally writing the results out as JSON.
+
+Each `bench_*` function in the benchmark modules takes the document
+parameters, does any expensive setup, and returns a callable to time.
+
+    python -m benchmarks --records 1000 --output results.json
+    python -m benchmarks --filter list --compare results.json
+"""
+
+import argparse
+import collections
+import importlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import timeit
+
+from lxml import etree
+
+
+MODULES = ('bench_descriptors', 'bench_lists', 'bench_paths',
+           'bench_serialization')
+
+Params = collections.namedtuple('Params', ['records', 'depth', 'items'])
+
+
+def discover(name_filter=None):
+    for module_name in MODULES:
+        module = importlib.import_module('benchmarks.' + module_name)
+        for name in sorted(vars(module)):
+            if not name.startswith('bench_'):
+                continue
+
+            full_name = '{0}.{1}'.format(module_name, name)
+            if name_filter and name_filter not in full_name:
+                continue
+
+            yield full_name, getattr(module, name)
+
+
+def time_callable(func, repeat, min_time):
+    timer = timeit.Timer(func)
+
+    number = 1
+    while True:
+        if timer.timeit(number) >= min_time:
+            break
+        number *= 10
+
+    return number, [elapsed / number
+                    for elapsed in timer.repeat(repeat, number)]
+
+
+def git_revision():
+    try:
+        with open(os.devnull, 'w') as devnull:
+            return subprocess.check_output(
+                ['git', 'rev-parse', 'HEAD'], stderr=devnull,
+                cwd=os.path.dirname(os.path.abspath(__file__))
+            ).decode('ascii').strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(params, name_filter=None, repeat=5, min_time=0.2, out=sys.stdout):
+    results = []
+    for name, bench in discover(name_filter):
+        func = bench(params)
+        number, times = time_callable(func, repeat, min_time)
+        result = {
+            'name': name,
+            'number': number,
+            'repeat': repeat,
+            'min': min(times),
+            'mean': sum(times) / len(times),
+            'max': max(times),
+        }
+        results.append(result)
+        out.write('{name:<60} {min:>12.6f}s\n'.format(**result))
+        out.flush()
+
+    return results
+
+
+def compare(results, old_path, out=sys.stdout):
+    with open(old_path) as old_file:
+        old = dict((result['name'], result)
+                   for result in json.load(old_file)['benchmarks'])
+
+    out.write('\n{0:<60} {1:>12} {2:>12} {3:>8}\n'.format(
+        'benchmark', 'old', 'new', 'ratio'))
+    for result in results:
+        old_result = old.get(result['name'], None)
+        if old_result is None:
+            continue
+
+        out.write('{0:<60} {1:>12.6f} {2:>12.6f} {3:>7.2f}x\n'.format(
+            result['name'], old_result['min'], result['min'],
+            old_result['min'] / result['min']))
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    arg_parser.add_argument('--records', type=int, default=1000,
+                            help='number of records (or list items)')
+    arg_parser.add_argument('--depth', type=int, default=3,
+                            help='nesting depth of mapped fields')
+    arg_parser.add_argument('--items', type=int, default=10,
+                            help='list items per record')
+    arg_parser.add_argument('--filter', default=None,
+                            help='only run benchmarks containing this')
+    arg_parser.add_argument('--repeat', type=int, default=5)
+    arg_parser.add_argument('--min-time', type=float, default=0.2,
+                            help='minimum seconds per timing run')
+    arg_parser.add_argument('--output', default=None,
+                            help='write the results to this JSON file')
+    arg_parser.add_argument('--compare', default=None,
+                            help='compare against a previous JSON file')
+    args = arg_parser.parse_args(argv)
+
+    params = Params(args.records, args.depth, args.items)
+    results = run(params, args.filter, args.repeat, args.min_time)
+
+    if args.output:
+        report = {
+            'timestamp': time.time(),
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'lxml': '.'.join(str(part) for part in etree.LXML_VERSION),
+            'params': params._asdict(),
+            'benchmarks': results,
+        }
+        with open(args.output, 'w') as output:
+            json.dump(report, output, indent=2, sort_keys=True)
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
@@ -10,6 +10,7 @@ setup(name='xmlmapper',
       url='https://github.com/directman12/py-xmlmapper',
       packages=['xmlmapper', 'xmlmapper.tests'],
       install_requires=['lxml', 'six'],
+      extras_require={'numpy': ['numpy']},
       keywords='xml',
       classifiers=[
           'Development Status :: 4 - Beta',
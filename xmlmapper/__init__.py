@@ -1,2 +1,4 @@
 from xmlmapper.core_modeler import *   # noqa
 from xmlmapper.path_modeler import ROOT, Custom  # noqa
+from xmlmapper.streaming import ModelWriter  # noqa
+from xmlmapper.columnar import columns  # noqa
@@ -0,0 +1,135 @@
+import asyncio
+
+from lxml import etree
+
+from xmlmapper import core_modeler as cm
+from xmlmapper import parsers
+
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+# marks the end of the chunks in a read-ahead buffer
+_EOF = object()
+
+
+async def _read_chunks(stream, chunk_size):
+    # streams (like `asyncio.StreamReader`) are read a chunk at a time,
+    # while anything else is taken to be an async iterable of chunks
+    if hasattr(stream, 'read'):
+        while True:
+            chunk = await stream.read(chunk_size)
+            if not chunk:
+                return
+
+            yield chunk
+    else:
+        async for chunk in stream:
+            yield chunk
+
+
+async def _read_ahead(chunks, size):
+    queue = asyncio.Queue(maxsize=size)
+
+    async def produce():
+        try:
+            async for chunk in chunks:
+                await queue.put(chunk)
+        except asyncio.CancelledError:
+            # (an `Exception` before Python 3.8)
+            raise
+        except Exception as exc:
+            await queue.put(exc)
+        else:
+            await queue.put(_EOF)
+
+    producer = asyncio.ensure_future(produce())
+    try:
+        while True:
+            chunk = await queue.get()
+            if chunk is _EOF:
+                return
+            elif isinstance(chunk, Exception):
+                raise chunk
+
+            yield chunk
+    finally:
+        producer.cancel()
+        await asyncio.gather(producer, return_exceptions=True)
+        await chunks.aclose()
+
+
+def chunks(stream, chunk_size=DEFAULT_CHUNK_SIZE, read_ahead=1):
+    """Reads chunks of bytes from an asynchronous stream.
+
+    `stream` may be anything with an awaitable `read(size)` method (such as
+    an `asyncio.StreamReader`), or an async iterable of bytes.  When
+    `read_ahead` is non-zero, up to that many chunks are read from the
+    stream in the background while earlier ones are being processed; the
+    stream isn't read any further until they've been consumed.
+    """
+    res = _read_chunks(stream, chunk_size)
+    if read_ahead:
+        res = _read_ahead(res, read_ahead)
+
+    return res
+
+
+async def from_async_stream(model_cls, stream, cache=False, project=False,
+                            chunk_size=DEFAULT_CHUNK_SIZE, read_ahead=1):
+    """Creates a model from an asynchronous stream of bytes.
+
+    Each chunk is fed to the parser as soon as it arrives, so the document
+    is never buffered as a whole.
+    """
+    # feeding interleaves with other tasks, so the parser can't be shared
+    parser = model_cls._parser(project, shared=False)
+    source = chunks(stream, chunk_size, read_ahead)
+    try:
+        async for chunk in source:
+            parser.feed(chunk)
+    finally:
+        await source.aclose()
+
+    return model_cls(parser.close(), cache=cache)
+
+
+async def aiterparse(model_cls, stream, tag=None, cache=False, where=None,
+                     chunk_size=DEFAULT_CHUNK_SIZE, read_ahead=1, **kwargs):
+    """Incrementally parses a stream, yielding one model per record.
+
+    This is the asynchronous equivalent of `Model.iterparse` (including
+    `where`, to only yield matching records): chunks are
+    fed to an `XMLPullParser` as they arrive, and a model is yielded as
+    soon as each record has been closed.  The next chunk is only parsed
+    once the records from the previous one have been consumed.
+    """
+    if tag is None:
+        tag = model_cls.ROOT_ELEM
+
+    options = parsers.parser_options(model_cls.PARSER_OPTIONS)
+    options.update(kwargs)
+    matches = cm._RecordFilter(model_cls, where) if where else None
+    parser = etree.XMLPullParser(events=('end',), tag=tag, **options)
+
+    def records():
+        for _, elem in parser.read_events():
+            if matches is None or matches(elem):
+                yield model_cls(elem, cache=cache)
+
+            elem.clear()
+            while elem.getprevious() is not None:
+                del elem.getparent()[0]
+
+    source = chunks(stream, chunk_size, read_ahead)
+    try:
+        async for chunk in source:
+            parser.feed(chunk)
+            for record in records():
+                yield record
+    finally:
+        # don't leave closing the stream to the garbage collector
+        await source.aclose()
+
+    parser.close()
+    for record in records():
+        yield record
@@ -0,0 +1,76 @@
+import collections
+import threading
+import weakref
+
+
+_lock = threading.Lock()
+_limit = None
+_entries = collections.OrderedDict()
+
+
+def set_limit(size):
+    """Bounds the number of cached values kept across all models.
+
+    When more than `size` values are cached (by models created with
+    `cache=True`), the least recently used ones are dropped.  Passing
+    `None` removes the bound.
+    """
+    global _limit
+
+    with _lock:
+        _limit = size
+
+    if size is not None:
+        _evict()
+
+
+def limit():
+    return _limit
+
+
+def clear():
+    """Forgets the recorded usage of all cached values."""
+    with _lock:
+        _entries.clear()
+
+
+def size():
+    return len(_entries)
+
+
+def _key(inst, desc):
+    return (id(inst), desc)
+
+
+def touch(inst, desc):
+    with _lock:
+        entry = _entries.pop(_key(inst, desc), None)
+        if entry is not None:
+            _entries[_key(inst, desc)] = entry
+
+
+def add(inst, desc):
+    with _lock:
+        key = _key(inst, desc)
+        _entries.pop(key, None)
+        _entries[key] = weakref.ref(inst)
+
+    _evict()
+
+
+def discard(inst, desc):
+    with _lock:
+        _entries.pop(_key(inst, desc), None)
+
+
+def _evict():
+    while True:
+        with _lock:
+            if _limit is None or len(_entries) <= _limit:
+                return
+
+            (_, desc), inst_ref = _entries.popitem(last=False)
+
+        inst = inst_ref()
+        if inst is not None:
+            desc._drop_cached_value(inst)
@@ -0,0 +1,148 @@
+import array
+import collections
+
+import six
+
+from xmlmapper import core_modeler as cm
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+try:
+    array.array('q')
+    _INT_TYPECODE = 'q'
+except ValueError:  # Python 2
+    _INT_TYPECODE = 'l'
+
+_LOADS_KINDS = dict((int_type, 'int') for int_type in six.integer_types)
+_LOADS_KINDS[float] = 'float'
+
+
+class _Column(object):
+    __slots__ = ('name', 'desc', 'loads', 'kind', 'values', 'missing')
+
+    def __init__(self, name, desc, kind=None):
+        if isinstance(desc, cm.AttributeValue):
+            loads = desc._loads
+        elif isinstance(desc, cm.NodeValue):
+            loads = desc._raw_loads
+        else:
+            raise TypeError('Field {name} ({desc!r}) cannot be extracted as '
+                            'a column: only text and attribute values '
+                            'can be'.format(name=name, desc=desc))
+
+        if kind is None:
+            kind = _LOADS_KINDS.get(loads, 'object')
+        elif kind not in ('int', 'float', 'object'):
+            raise ValueError("Unknown column kind '{kind}' for field {name} "
+                             "(expected 'int', 'float' or 'object')".format(
+                                 kind=kind, name=name))
+
+        self.name = name
+        self.desc = desc
+        self.loads = loads
+        self.kind = kind
+        self.values = []
+        self.missing = []
+
+    def raw(self, node):
+        if node is None:
+            return None
+        elif isinstance(self.desc, cm.AttributeValue):
+            return node.get(self.desc._attr_name, None)
+        else:
+            return node.text
+
+
+def _fill(column, missing):
+    if not column.missing:
+        return column.values
+
+    if column.kind == 'float' and missing is None:
+        fill = 'nan'
+    elif column.kind == 'int' and missing is None:
+        raise ValueError('Field {name} is missing in {num} record(s), and '
+                         'has no value to use instead'.format(
+                             name=column.name, num=len(column.missing)))
+    else:
+        fill = six.text_type(missing)
+
+    values = column.values
+    for ind in column.missing:
+        values[ind] = fill
+
+    return values
+
+
+def _to_array(column, missing):
+    if column.kind == 'object':
+        loads = column.loads
+        values = [loads(val) if val is not None else missing
+                  for val in column.values]
+
+        if numpy is not None:
+            res = numpy.empty(len(values), dtype=object)
+            res[:] = values
+            return res
+        else:
+            return values
+
+    values = _fill(column, missing)
+    if numpy is not None:
+        dtype = numpy.int64 if column.kind == 'int' else numpy.float64
+        return numpy.array(values, dtype=dtype)
+    elif column.kind == 'int':
+        return array.array(_INT_TYPECODE, map(int, values))
+    else:
+        return array.array('d', map(float, values))
+
+
+def columns(model_cls, elements, fields=None, kinds=None, missing=None):
+    """Extracts fields from many records into one array per field.
+
+    `elements` may contain root elements for `model_cls` or models.  Only
+    text (`NodeValue`) and attribute (`AttributeValue`) fields may be
+    extracted.  Fields loaded with `int` or `float` produce numeric arrays,
+    converted straight from the raw strings in bulk rather than through
+    `loads`; other fields are loaded normally into object arrays.  The
+    column kind ('int', 'float' or 'object') may be overridden per field
+    with `kinds`.
+
+    NumPy arrays are returned when NumPy is installed, otherwise
+    `array.array`s (or lists, for object columns).  Missing values are
+    replaced by `missing`, which defaults to NaN for float columns and
+    `None` for object columns (int columns with missing values require
+    `missing` to be given).
+    """
+    if fields is None:
+        fields = model_cls.field_names()
+
+    kinds = kinds or {}
+    descriptors = model_cls._descriptors
+    cols = []
+    for name in fields:
+        try:
+            desc = descriptors[name]
+        except KeyError:
+            raise ValueError('{model} has no field {name}'.format(
+                model=model_cls.__name__, name=name))
+
+        cols.append(_Column(name, desc, kinds.get(name, None)))
+
+    for ind, elem in enumerate(elements):
+        if isinstance(elem, cm.Model):
+            elem = elem._etree
+
+        model_cls._check_root(elem)
+
+        for col in cols:
+            raw = col.raw(col.desc._compiled_path.find(elem))
+            if raw is None:
+                col.missing.append(ind)
+            col.values.append(raw)
+
+    return collections.OrderedDict((col.name, _to_array(col, missing))
+                                   for col in cols)
@@ -1,9 +1,19 @@
 import collections
+import copy
+import functools
+import hashlib
+import mmap
+import operator
+import re
 import weakref
 
 from lxml import etree
 import six
 
+from xmlmapper import caching
+from xmlmapper import locking
+from xmlmapper import parsers
+
 
 def split_elem_def(path):
     """Get the element name and attribute selectors from an XPath path."""
@@ -44,11 +54,13 @@ def make_elem(desc_str):
         return elem
 
 
-# TODO(sross): make this work in when we have
-#              an attribute selector with a '/'
-#              in the value portion
 def make_path(path, root, to_parent=False):
     """Like mkdir -p, but for XML."""
+    return parse_path(path).create(root, to_parent)
+
+
+def _make_path_by_find(path, root, to_parent=False):
+    # used for paths that can't be parsed into simple steps
     parent_node = None
     parts = path.rsplit('/', 1)
     missing_parts = []
@@ -80,9 +92,752 @@ def make_path(path, root, to_parent=False):
     return parent_node
 
 
-class CustomNodeValue(object):
-    def __init__(self, node_path, loads, dumps):
+class CompiledPath(object):
+    """A path compiled once into XPath objects for finding nodes.
+
+    By default, the path is expected to be an ElementPath expression (as
+    accepted by `find`), which is compiled with `etree.ETXPath`, unless it
+    is of a kind which `find` or `findall` handle more quickly.
+    When `xpath` is `True`, the path may be any XPath 1.0 expression which
+    selects elements.
+    """
+
+    __slots__ = ('path', 'xpath', 'find', 'findall')
+
+    def __init__(self, path, xpath=False):
+        self.path = path
+        self.xpath = xpath
+
+        if xpath:
+            first = all_matches = etree.XPath(path)
+        elif path == '.':
+            self.find = lambda elem: elem
+            self.findall = lambda elem: [elem]
+            return
+        elif '{*}' in path or '{}' in path or '' in split_path(path)[1:]:
+            # ElementPath-only namespace wildcards, and descendant searches
+            # (which `find` stops at the first match)
+            self.find = lambda elem: elem.find(path)
+            self.findall = lambda elem: elem.findall(path)
+            return
+        else:
+            # for a single step, '[1]' stops at the first match (unlike
+            # '(...)[1]'), and `findall` collects plain children quicker
+            single = len(split_path(path)) == 1 and path != '..'
+            try:
+                if single:
+                    first = etree.ETXPath(path + '[1]')
+                else:
+                    first = etree.ETXPath('(' + path + ')[1]')
+
+                if single and '[' not in path:
+                    all_matches = operator.methodcaller('findall', path)
+                else:
+                    all_matches = etree.ETXPath(path)
+            except etree.XPathSyntaxError:
+                self.find = lambda elem: elem.find(path)
+                self.findall = lambda elem: elem.findall(path)
+                return
+
+        def find_first(elem):
+            res = first(elem)
+            if res:
+                return res[0]
+            else:
+                return None
+
+        self.find = find_first
+        self.findall = all_matches
+
+    def __repr__(self):
+        return "<CompiledPath({path}{xpath})>".format(
+            path=self.path, xpath=', xpath' if self.xpath else '')
+
+
+_compiled_paths = {}
+
+
+def compile_path(path, xpath=False):
+    """Compiles a path, reusing the result for identical paths."""
+    key = (path, xpath)
+    compiled = _compiled_paths.get(key, None)
+    if compiled is None:
+        compiled = _compiled_paths[key] = CompiledPath(path, xpath)
+
+    return compiled
+
+
+def split_path(path):
+    """Splits an XPath path into steps, ignoring '/' in predicates."""
+    steps = []
+    depth = 0
+    quote = None
+    start = 0
+    for ind, char in enumerate(path):
+        if quote is not None:
+            if char == quote:
+                quote = None
+        elif char in ('"', "'"):
+            quote = char
+        elif char in ('[', '{'):
+            depth += 1
+        elif char in (']', '}'):
+            depth -= 1
+        elif char == '/' and depth == 0:
+            steps.append(path[start:ind])
+            start = ind + 1
+
+    steps.append(path[start:])
+    return steps
+
+
+_STEP_RE = re.compile(r'^(\*|(?:\{[^}]*\})?[\w.-]+)((?:\[[^\]]*\])*)$')
+_ATTR_PRED_RE = re.compile(r'\[@([\w.-]+)(?:=(?:"([^"]*)"|\'([^\']*)\'))?\]')
+
+
+def _parse_step(step):
+    match = _STEP_RE.match(step)
+    if match is None or step == '..':
+        return None
+
+    tag, preds = match.groups()
+    attrs = []
+    pos = 0
+    for pred_match in _ATTR_PRED_RE.finditer(preds):
+        if pred_match.start() != pos:
+            return None
+        pos = pred_match.end()
+
+        name, dq_val, sq_val = pred_match.groups()
+        attrs.append((name, dq_val if dq_val is not None else sq_val))
+
+    if pos != len(preds):
+        return None
+
+    return (tag, tuple(attrs))
+
+
+def _matches_attrs(elem, attrs):
+    for name, val in attrs:
+        actual = elem.get(name, None)
+        if actual is None or (val is not None and actual != val):
+            return False
+
+    return True
+
+
+class CreationPath(object):
+    """A path parsed once into the steps needed to create it.
+
+    Each step is a tag along with the attributes from its attribute
+    predicates.  Paths with other kinds of steps (such as '..', '//', or
+    positional predicates) fall back to finding each prefix of the path.
+    """
+
+    __slots__ = ('path', 'steps', '_parent_steps', '_specs')
+
+    def __init__(self, path):
+        self.path = path
+
+        steps = []
+        for step in split_path(path):
+            if step == '.':
+                continue
+
+            parsed = _parse_step(step)
+            if parsed is None:
+                steps = None
+                break
+
+            steps.append(parsed)
+
+        self.steps = steps
+        if steps is not None:
+            self._parent_steps = steps[:-1]
+            self._specs = [(tag, dict((name, val or '')
+                                      for name, val in attrs))
+                           for tag, attrs in steps]
+
+    def _deepest(self, elem, steps, depth):
+        # depth-first in document order, so that the first of the
+        # deepest matches is the same one that `find` would return
+        best = (elem, depth)
+        if depth == len(steps):
+            return best
+
+        tag, attrs = steps[depth]
+        for child in elem.iterchildren(
+                tag=etree.Element if tag == '*' else tag):
+            if not _matches_attrs(child, attrs):
+                continue
+
+            found = self._deepest(child, steps, depth + 1)
+            if found[1] > best[1]:
+                best = found
+                if found[1] == len(steps):
+                    break
+
+        return best
+
+    def create(self, root, to_parent=False):
+        """Finds the node for this path, creating any missing elements."""
+        if self.steps is None:
+            return _make_path_by_find(self.path, root, to_parent)
+
+        steps = self._parent_steps if to_parent else self.steps
+        node, depth = self._deepest(root, steps, 0)
+
+        for tag, attrib in self._specs[depth:len(steps)]:
+            if tag == '*':
+                raise ValueError('Cannot create a wildcard element '
+                                 'for {0}'.format(self.path))
+
+            node = etree.SubElement(node, tag, attrib)
+
+        return node
+
+    def new_elem(self):
+        """Creates a detached element for the last step of this path."""
+        if self.steps is None:
+            return make_elem(self.path.rpartition('/')[2])
+
+        tag, attrib = self._specs[-1]
+        return etree.Element(tag, attrib)
+
+    def set_attrs(self, elem):
+        """Sets the attributes from the last step of this path on `elem`."""
+        if self.steps is None:
+            set_elem_attrs(split_elem_def(self.path)[1], elem)
+        elif self._specs:
+            for name, val in self._specs[-1][1].items():
+                elem.set(name, val)
+
+    def __repr__(self):
+        return "<CreationPath({path})>".format(path=self.path)
+
+
+_creation_paths = {}
+
+
+def parse_path(path):
+    """Parses a path for creation, reusing the result for identical paths."""
+    parsed = _creation_paths.get(path, None)
+    if parsed is None:
+        parsed = _creation_paths[path] = CreationPath(path)
+
+    return parsed
+
+
+class _PlanNode(object):
+    __slots__ = ('tag', 'attrs', 'children', 'descs')
+
+    def __init__(self, tag=None, attrs=()):
+        self.tag = tag
+        self.attrs = attrs
+        self.children = collections.OrderedDict()
+        self.descs = []
+
+    def child(self, step):
+        node = self.children.get(step, None)
+        if node is None:
+            node = self.children[step] = type(self)(*step)
+
+        return node
+
+    def matches(self, elem):
+        if self.tag != '*' and self.tag != elem.tag:
+            return False
+
+        return _matches_attrs(elem, self.attrs)
+
+    def walk(self, elem, found):
+        for desc in self.descs:
+            found[desc] = elem
+
+        if not self.children:
+            return
+
+        # like `find`, each step is only followed into the first child
+        # that it matches (which may also be matched by other steps), so
+        # any nodes below later matches are left for `find` to look up
+        pending = list(self.children.values())
+        matched = []
+        for child in elem.iterchildren(tag=etree.Element):
+            still_pending = []
+            for plan_node in pending:
+                if plan_node.matches(child):
+                    matched.append((plan_node, child))
+                else:
+                    still_pending.append(plan_node)
+
+            pending = still_pending
+            if not pending:
+                break
+
+        for plan_node, child in matched:
+            plan_node.walk(child, found)
+
+
+class AccessorPlan(object):
+    """Resolves the nodes for a set of descriptors in a single tree walk.
+
+    The descriptors' paths are compiled into a prefix tree, so that shared
+    path prefixes are only ever looked up once.  Paths which cannot be
+    matched step by step (e.g. ones containing '//' or non-attribute
+    predicates) are left out, as are nodes which could not be found, so
+    descriptors should fall back to a normal `find` for those.
+    """
+
+    def __init__(self, descriptors):
+        self._root = _PlanNode()
+        self.descriptors = []
+
+        for desc in descriptors:
+            if desc._compiled_path.xpath:
+                continue
+
+            # (shared with the creation path, parsed once per path)
+            steps = parse_path(desc._node_path).steps
+            if steps is None:
+                continue
+
+            plan_node = self._root
+            for step in steps:
+                plan_node = plan_node.child(step)
+
+            plan_node.descs.append(desc)
+            self.descriptors.append(desc)
+
+    def resolve(self, root):
+        found = {}
+        self._root.walk(root, found)
+        return found
+
+    def __repr__(self):
+        return "<AccessorPlan ({num} descriptors)>".format(
+            num=len(self.descriptors))
+
+
+_STEP_TAG_RE = re.compile(r'^(\*|(?:\{[^}]*\})?[\w.-]+)\[')
+
+
+class _ProjectionNode(_PlanNode):
+    __slots__ = ('keep_all',)
+
+    def __init__(self, tag=None, attrs=()):
+        super(_ProjectionNode, self).__init__(tag, attrs)
+        self.keep_all = False
+
+    def matches_start(self, tag, attrib):
+        if self.tag != '*' and self.tag != tag:
+            return False
+
+        return _matches_attrs(attrib, self.attrs)
+
+
+class Projection(object):
+    """The parts of a document which are mapped by a model class.
+
+    Each path is added to a prefix tree, as with an `AccessorPlan`.  The
+    nodes of text and attribute values are kept without their children,
+    sub-models contribute their own paths, and the nodes of other mappings
+    are kept along with their whole subtrees.  Any path which can't be
+    matched step by step keeps everything below the point where it can no
+    longer be followed, so that the projected tree is always a superset of
+    what the model needs.
+    """
+
+    def __init__(self, model_cls):
+        self.root = _ProjectionNode()
+        self._add_model(model_cls, self.root, frozenset())
+
+    @property
+    def keeps_all(self):
+        return self.root.keep_all
+
+    def _add_model(self, model_cls, node, seen):
+        if model_cls in seen:
+            node.keep_all = True
+            return
+
+        seen = seen | frozenset([model_cls])
+        for desc in model_cls._descriptors.values():
+            target = self._add_path(node, desc._node_path,
+                                    desc._compiled_path.xpath)
+            if target is None:
+                continue
+
+            if isinstance(desc, ModelNodeValue):
+                self._add_model(desc._model, target, seen)
+            elif isinstance(desc, (NodeValue, AttributeValue)):
+                pass
+            elif isinstance(desc, NodeValueList):
+                target.keep_all = True
+            elif isinstance(desc, NodeValueListView):
+                selected = self._add_path(target, desc._selector,
+                                          desc._compiled_selector.xpath)
+                if selected is not None:
+                    selected.keep_all = True
+            else:
+                target.keep_all = True
+
+    def _add_path(self, node, path, xpath):
+        if xpath or path.startswith('/'):
+            node.keep_all = True
+            return None
+
+        for step in split_path(path):
+            if step == '.':
+                continue
+
+            parsed = _parse_step(step)
+            if parsed is None:
+                # keep every element which could match this step
+                tag_match = _STEP_TAG_RE.match(step)
+                if tag_match is not None:
+                    node = node.child((tag_match.group(1), ()))
+
+                node.keep_all = True
+                return None
+
+            node = node.child(parsed)
+
+        return node
+
+
+class _ProjectionTarget(object):
+    """A parser target which builds only the projected parts of a tree."""
+
+    def __init__(self, projection):
+        self._projection = projection
+        self._builder = etree.TreeBuilder()
+
+        # the matching projection nodes for each open element
+        self._stack = []
+        # how deep we are into a skipped or fully kept subtree
+        self._skipped = 0
+        self._kept_all = 0
+        # whether we're still in the text (rather than a tail)
+        # of the innermost open element
+        self._text_open = False
+
+    def _build_start(self, tag, attrib, nsmap):
+        if nsmap:
+            nsmap = dict((prefix or None, uri)
+                         for prefix, uri in nsmap.items())
+
+        self._builder.start(tag, attrib, nsmap or None)
+
+    def start(self, tag, attrib, nsmap=None):
+        if self._skipped:
+            self._skipped += 1
+            return
+
+        if self._kept_all:
+            self._kept_all += 1
+            self._build_start(tag, attrib, nsmap)
+            return
+
+        self._text_open = False
+        if self._stack:
+            matches = [child for node in self._stack[-1]
+                       for child in node.children.values()
+                       if child.matches_start(tag, attrib)]
+            if not matches:
+                self._skipped = 1
+                return
+        else:
+            matches = [self._projection.root]
+
+        self._build_start(tag, attrib, nsmap)
+        if any(node.keep_all for node in matches):
+            self._kept_all = 1
+        else:
+            self._stack.append(matches)
+            self._text_open = True
+
+    def end(self, tag):
+        if self._skipped:
+            self._skipped -= 1
+            return
+
+        if self._kept_all:
+            self._kept_all -= 1
+        else:
+            self._stack.pop()
+            self._text_open = False
+
+        self._builder.end(tag)
+
+    def data(self, data):
+        if self._kept_all or (self._text_open and not self._skipped):
+            self._builder.data(data)
+
+    def comment(self, text):
+        if self._kept_all:
+            self._builder.comment(text)
+
+    def pi(self, target, data=None):
+        if self._kept_all:
+            self._builder.pi(target, data)
+
+    def close(self):
+        return self._builder.close()
+
+
+class _RecordFilter(object):
+    """Checks record elements against conditions on a model's fields.
+
+    The conditions are checked from the cheapest to the most expensive to
+    evaluate (attributes and text of the record element itself, then its
+    direct children, then anything else), stopping at the first which
+    fails, so that records which don't match are rejected without ever
+    being wrapped in a model.
+    """
+
+    def __init__(self, model_cls, where):
+        conds = []
+        for name, expected in where.items():
+            try:
+                desc = model_cls._descriptors[name]
+            except KeyError:
+                raise ValueError('{model} has no field {name}'.format(
+                    model=model_cls.__name__, name=name))
+
+            if callable(expected):
+                test = expected
+            else:
+                test = functools.partial(operator.eq, expected)
+
+            steps = desc._creation_path.steps
+            if desc._compiled_path.xpath or steps is None:
+                cost = 2
+            elif desc._node_path.startswith('/'):
+                cost = 2
+            else:
+                cost = min(len(steps), 2)
+
+            conds.append((cost, len(conds), desc, test))
+
+        conds.sort()
+        self._conds = [(cost == 0, desc, test)
+                       for cost, _, desc, test in conds]
+
+    def __call__(self, elem):
+        for at_root, desc, test in self._conds:
+            if at_root:
+                node = elem
+            else:
+                node = desc._compiled_path.find(elem)
+
+            if not test(desc._extract(node)):
+                return False
+
+        return True
+
+
+class ModelTemplate(object):
+    """A skeleton tree for building models with a given set of fields.
+
+    The nodes for each field are created once, up front, and remembered as
+    a chain of child indices.  Building a model then just copies the
+    skeleton and fills in the values, without looking up or creating any
+    paths.
+    """
+
+    def __init__(self, model_cls, names):
+        self._root = etree.Element(model_cls.ROOT_ELEM)
+
+        # create the nodes in definition order, so that sibling
+        # order doesn't depend on the order of the given names
+        fields = [(name, desc) for name, desc
+                  in model_cls._descriptors.items() if name in names]
+        nodes = []
+        for _, desc in fields:
+            node = desc._compiled_path.find(self._root)
+            if node is None:
+                node = desc._template_node(self._root)
+            nodes.append(node)
+
+        self._fields = [(name, desc, self._index_chain(node))
+                        for (name, desc), node in zip(fields, nodes)]
+
+    def _index_chain(self, node):
+        chain = []
+        while node is not self._root:
+            parent = node.getparent()
+            chain.append(parent.index(node))
+            node = parent
+
+        chain.reverse()
+        return tuple(chain)
+
+    def build(self, values):
+        root = copy.deepcopy(self._root)
+
+        # locate all the nodes first, since filling may add or
+        # replace nodes (shifting the indices of their siblings)
+        targets = []
+        for name, desc, chain in self._fields:
+            node = root
+            for ind in chain:
+                node = node[ind]
+
+            targets.append((desc, node, values[name]))
+
+        for desc, node, value in targets:
+            desc._fill(node, value)
+
+        return root
+
+    def __repr__(self):
+        return "<ModelTemplate ({fields})>".format(
+            fields=', '.join(name for name, _, _ in self._fields))
+
+
+# marks values which haven't been cached (since `None` may be cached)
+_UNCACHED = object()
+
+
+def _shallow_copy(node):
+    elem = etree.Element(node.tag, dict(node.attrib))
+    elem.text = node.text
+    return elem
+
+
+def _writes(method):
+    """Runs a mapping method under the model's write lock, if it has one."""
+    @functools.wraps(method)
+    def locked(self, inst, *args):
+        if inst._lock is None:
+            return method(self, inst, *args)
+
+        with inst._lock.writing():
+            return method(self, inst, *args)
+
+    return locked
+
+
+def _view_writes(method):
+    """Like `_writes`, but for the methods of list objects."""
+    @functools.wraps(method)
+    def locked(self, *args):
+        if self.inst._lock is None:
+            return method(self, *args)
+
+        with self.inst._lock.writing():
+            return method(self, *args)
+
+    return locked
+
+
+class _InstanceStorage(object):
+    """Stores the nodes and cached values of a descriptor for each model.
+
+    Models with `SLOT_STORAGE` enabled keep these in per-instance lists,
+    indexed by the descriptor's slot number in the model class.  Otherwise
+    (or for descriptors which aren't part of the model's class), they are
+    kept in weak dictionaries on the descriptor itself.
+    """
+
+    def _stored_node(self, inst):
+        ind = inst._slot_index.get(self, None)
+        if ind is None:
+            return self._nodes.get(inst, None)
+        else:
+            return inst._node_slots[ind]
+
+    def _store_node(self, inst, node):
+        ind = inst._slot_index.get(self, None)
+        if ind is None:
+            self._nodes[inst] = node
+        else:
+            inst._node_slots[ind] = node
+
+        return node
+
+    def _forget_node(self, inst):
+        ind = inst._slot_index.get(self, None)
+        if ind is None:
+            self._nodes.pop(inst, None)
+        else:
+            inst._node_slots[ind] = None
+
+    @_writes
+    def _create_node(self, inst):
+        """Creates a missing node on access, for `always_present`."""
+        # another thread may have created it while we waited for the lock
+        node = self._compiled_path.find(inst._etree)
+        if node is not None:
+            return self._store_node(inst, node)
+
+        inst._changing(self)
+        node = self._store_node(inst, self._creation_path.create(inst._etree))
+        inst._changed(self)
+        return node
+
+    def _stored_wrapper(self, inst):
+        wrappers = inst._wrappers
+        if wrappers is None:
+            return None
+        else:
+            return wrappers.get(self, None)
+
+    def _store_wrapper(self, inst, wrapper):
+        if inst._wrappers is None:
+            inst._wrappers = {}
+
+        inst._wrappers[self] = wrapper
+        return wrapper
+
+    def _forget_wrapper(self, inst):
+        if inst._wrappers is not None:
+            inst._wrappers.pop(self, None)
+
+    def _cached_value(self, inst):
+        """Gets the cached value, or `_UNCACHED` if there isn't one."""
+        ind = inst._slot_index.get(self, None)
+        if ind is None:
+            val = self._cached_vals.get(inst, _UNCACHED)
+        else:
+            val = inst._value_slots[ind]
+
+        if val is not _UNCACHED and caching._limit is not None:
+            caching.touch(inst, self)
+
+        return val
+
+    def _cache_value(self, inst, value):
+        ind = inst._slot_index.get(self, None)
+        if ind is None:
+            self._cached_vals[inst] = value
+        else:
+            inst._value_slots[ind] = value
+
+        if caching._limit is not None:
+            caching.add(inst, self)
+
+    def _drop_cached_value(self, inst):
+        ind = inst._slot_index.get(self, None)
+        if ind is None:
+            self._cached_vals.pop(inst, None)
+        else:
+            inst._value_slots[ind] = _UNCACHED
+
+    def _uncache_value(self, inst):
+        self._drop_cached_value(inst)
+        if caching._limit is not None:
+            caching.discard(inst, self)
+
+    def _snapshot_node(self, node):
+        return copy.deepcopy(node)
+
+
+class CustomNodeValue(_InstanceStorage):
+    def __init__(self, node_path, loads, dumps, xpath=False):
         self._node_path = node_path
+        self._compiled_path = compile_path(node_path, xpath)
+        self._creation_path = parse_path(node_path)
         self._loads = loads
         self._dumps = dumps
 
@@ -93,13 +848,15 @@ class CustomNodeValue(object):
         if inst is None:
             return self
 
-        node = self._nodes.get(inst, None)
+        if inst._cache:
+            cached_val = self._cached_value(inst)
+            if cached_val is not _UNCACHED:
+                return cached_val
 
-        if node is None:
-            node = self._nodes[inst] = inst._etree.find(self._node_path)
+        node = self._stored_node(inst)
 
-        if inst._cache and self._cached_vals.get(inst, None) is not None:
-            return self._cached_vals[inst]
+        if node is None:
+            node = self._store_node(inst, inst._find_node(self))
 
         if node is not None:
             res = self._loads(node)
@@ -107,31 +864,50 @@ class CustomNodeValue(object):
             res = None
 
         if inst._cache:
-            self._cached_vals[inst] = res
+            self._cache_value(inst, res)
 
         return res
 
+    def _extract(self, node, recursive=False):
+        if node is not None:
+            return self._loads(node)
+        else:
+            return None
+
+    def _template_node(self, root):
+        parent_node = self._creation_path.create(root, to_parent=True)
+        elem = self._creation_path.new_elem()
+        parent_node.append(elem)
+        return elem
+
+    def _fill(self, node, value):
+        new_node = self._dumps(value, node)
+        if new_node is None:
+            node.getparent().remove(node)
+        elif new_node is not node:
+            node.getparent().replace(node, new_node)
+
+    @_writes
     def __set__(self, inst, value):
-        node = self._nodes.get(inst, None)
+        inst._changing(self)
+
+        node = self._stored_node(inst)
 
         if node is None:
-            node = self._nodes[inst] = inst._etree.find(self._node_path)
+            node = self._store_node(inst, inst._find_node(self))
 
         if inst._cache:
-            self._cached_vals[inst] = value
+            self._cache_value(inst, value)
 
         if node is None:
-            parent_node = make_path(self._node_path, inst._etree,
-                                    to_parent=True)
+            parent_node = self._creation_path.create(inst._etree,
+                                                     to_parent=True)
 
-            elem_name, attrs = split_elem_def(self._node_path)
-            elem = etree.Element(elem_name)
-            set_elem_attrs(attrs, elem)
-
-            elem = self._dumps(value, elem)
+            elem = self._dumps(value, self._creation_path.new_elem())
 
             parent_node.append(elem)
-            node = self._nodes[inst] = elem
+            node = self._store_node(inst, elem)
+            new_node = node
         else:
             new_node = self._dumps(value, node)
             if new_node is None:
@@ -143,22 +919,28 @@ class CustomNodeValue(object):
                 node_parent.remove(node)
 
                 node_parent.insert(ind, node)
-                self._nodes[inst] = node
+                self._store_node(inst, node)
+
+        inst._changed(self, detached=new_node is not node)
 
+    @_writes
     def __delete__(self, inst):
-        node = self._nodes.get(inst, None)
+        inst._changing(self)
+
+        node = self._stored_node(inst)
 
         if node is None:
-            node = inst._etree.find(self._node_path)
+            node = inst._find_node(self)
 
         if inst._cache:
-            self._cached_vals[inst] = None
+            self._cache_value(inst, None)
 
         if node is None:
             raise AttributeError('No such node {0}'.format(self._node_path))
         else:
             node.getparent().remove(node)
-            self._nodes.pop(inst, None)
+            self._forget_node(inst)
+            inst._changed(self, detached=True)
 
     def __repr__(self):
         return ("<XML mapping[{type}] "
@@ -167,8 +949,11 @@ class CustomNodeValue(object):
 
 
 class NodeValue(CustomNodeValue):
-    def __init__(self, node_path, loads=six.text_type, dumps=six.text_type):
+    def __init__(self, node_path, loads=six.text_type, dumps=six.text_type,
+                 xpath=False):
         self._node_path = node_path
+        self._compiled_path = compile_path(node_path, xpath)
+        self._creation_path = parse_path(node_path)
 
         self._raw_loads = loads
         self._loads = lambda e: self._raw_loads(e.text)
@@ -177,20 +962,34 @@ class NodeValue(CustomNodeValue):
         self._cached_vals = weakref.WeakKeyDictionary()
         self._nodes = weakref.WeakKeyDictionary()
 
+    @_writes
     def __set__(self, inst, value):
-        node = self._nodes.get(inst, None)
+        inst._changing(self)
+
+        node = self._stored_node(inst)
 
         if node is None:
-            node = self._nodes[inst] = inst._etree.find(self._node_path)
+            node = self._store_node(inst, inst._find_node(self))
 
         if inst._cache:
-            self._cached_vals[inst] = value
+            self._cache_value(inst, value)
 
         if node is None:
-            node = self._nodes[inst] = make_path(self._node_path, inst._etree)
+            node = self._store_node(
+                inst, self._creation_path.create(inst._etree))
 
         text_val = self._dumps(value)
         node.text = text_val
+        inst._changed(self)
+
+    def _template_node(self, root):
+        return self._creation_path.create(root)
+
+    def _fill(self, node, value):
+        node.text = self._dumps(value)
+
+    def _snapshot_node(self, node):
+        return _shallow_copy(node)
 
     def __repr__(self):
         return ("<XML mapping[{type}] "
@@ -198,10 +997,14 @@ class NodeValue(CustomNodeValue):
                                             path=self._node_path)
 
 
-class ModelNodeValue(object):
-    def __init__(self, node_path, model_cls, always_present=True):
+class ModelNodeValue(_InstanceStorage):
+    def __init__(self, node_path, model_cls, always_present=True,
+                 xpath=False):
         self._node_path = node_path
+        self._compiled_path = compile_path(node_path, xpath)
+        self._creation_path = parse_path(node_path)
         self._model = model_cls
+        self._cached_vals = weakref.WeakKeyDictionary()
         self._nodes = weakref.WeakKeyDictionary()
         self._always_present = always_present
 
@@ -209,52 +1012,103 @@ class ModelNodeValue(object):
         if inst is None:
             return self
 
-        node = self._nodes.get(inst, None)
+        if inst._cache:
+            cached_val = self._cached_value(inst)
+            if cached_val is not _UNCACHED:
+                return cached_val
+
+        node = self._stored_node(inst)
 
         if node is None:
-            node = self._nodes[inst] = inst._etree.find(self._node_path)
+            node = self._store_node(inst, inst._find_node(self))
 
         if node is not None:
-            return self._model(node, cache=inst._cache)
-        elif self._always_present:
-            node = make_path(self._node_path, inst._etree)
-            obj = self._model(node, cache=inst._cache)
-            self._nodes[inst] = node
-            return obj
+            obj = self._stored_wrapper(inst)
+            if obj is None or obj._etree is not node:
+                obj = self._wrap(inst, node)
+        elif not self._always_present or inst._lock is locking.FROZEN:
+            obj = None
+        elif inst._can_create():
+            obj = self._wrap(inst, self._create_node(inst))
         else:
+            # (not cached, since it's created once we're done reading)
             return None
 
+        if inst._cache:
+            self._cache_value(inst, obj)
+
+        return obj
+
+    def _wrap(self, inst, node):
+        model = self._model(node, cache=inst._cache)
+        return self._store_wrapper(inst, inst._adopt(model, self))
+
+    def _extract(self, node, recursive=False):
+        if node is None:
+            return None
+        elif recursive:
+            return self._model._extract(node, recursive=True)
+        else:
+            return self._model(node)
+
+    def _template_node(self, root):
+        return self._creation_path.create(root)
+
+    def _fill(self, node, value):
+        if isinstance(value, dict):
+            value = self._model.from_dict(value)
+
+        self._creation_path.set_attrs(value._etree)
+        node.getparent().replace(node, value._etree)
+
+    @_writes
     def __set__(self, inst, value):
-        node = self._nodes.get(inst, None)
+        inst._changing(self)
+
+        node = self._stored_node(inst)
 
         if node is None:
-            node = self._nodes[inst] = inst._etree.find(self._node_path)
+            node = self._store_node(inst, inst._find_node(self))
 
         if node is None:
-            parent_node = make_path(self._node_path, inst._etree,
-                                    to_parent=True)
-            set_elem_attrs(split_elem_def(self._node_path)[1], value._etree)
+            parent_node = self._creation_path.create(inst._etree,
+                                                     to_parent=True)
+            self._creation_path.set_attrs(value._etree)
             parent_node.append(value._etree)
-            node = self._nodes[inst] = value._etree
+            node = self._store_node(inst, value._etree)
         else:
             node_parent = node.getparent()
             ind = node_parent.index(node)
             node_parent.remove(node)
-            set_elem_attrs(split_elem_def(self._node_path)[1], inst._etree)
+            self._creation_path.set_attrs(inst._etree)
             node_parent.insert(ind, value._etree)
-            self._nodes[inst] = value._etree
+            self._store_node(inst, value._etree)
+
+        self._store_wrapper(inst, inst._adopt(value, self))
+        if inst._cache:
+            self._cache_value(inst, value)
+
+        inst._changed(self, detached=node is not value._etree)
 
+    @_writes
     def __delete__(self, inst):
-        node = self._nodes.get(inst, None)
+        inst._changing(self)
+
+        node = self._stored_node(inst)
 
         if node is None:
-            node = inst._etree.find(self._node_path)
+            node = inst._find_node(self)
+
+        if inst._cache:
+            self._uncache_value(inst)
 
         if node is None:
             raise AttributeError('No such node {0}'.format(self._node_path))
         else:
             node.getparent().remove(node)
-            self._nodes.pop(inst, None)
+            self._forget_node(inst)
+            self._forget_wrapper(inst)
+            inst._changed(self, detached=True)
 
     def __repr__(self):
         return ("<XML mapping[{type}] ({path}) --> "
@@ -263,10 +1117,12 @@ class ModelNodeValue(object):
                                    model=self._model.__name__)
 
 
-class AttributeValue(object):
+class AttributeValue(_InstanceStorage):
     def __init__(self, node_path, attr_name,
-                 loads=six.text_type, dumps=six.text_type):
+                 loads=six.text_type, dumps=six.text_type, xpath=False):
         self._node_path = node_path
+        self._compiled_path = compile_path(node_path, xpath)
+        self._creation_path = parse_path(node_path)
         self._attr_name = attr_name
         self._loads = loads
         self._dumps = dumps
@@ -278,13 +1134,15 @@ class AttributeValue(object):
         if inst is None:
             return self
 
-        node = self._nodes.get(inst, None)
+        if inst._cache:
+            cached_val = self._cached_value(inst)
+            if cached_val is not _UNCACHED:
+                return cached_val
 
-        if node is None:
-            node = self._nodes[inst] = inst._etree.find(self._node_path)
+        node = self._stored_node(inst)
 
-        if inst._cache and self._cached_vals.get(inst, None) is not None:
-            return self._cached_vals[inst]
+        if node is None:
+            node = self._store_node(inst, inst._find_node(self))
 
         if node is not None:
             attr_val = node.get(self._attr_name, None)
@@ -295,40 +1153,68 @@ class AttributeValue(object):
         else:
             res = None
 
-        if inst._cache and res is not None:
-            self._cached_vals[inst] = res
+        if inst._cache:
+            self._cache_value(inst, res)
 
         return res
 
+    def _extract(self, node, recursive=False):
+        if node is None:
+            return None
+
+        attr_val = node.get(self._attr_name, None)
+        if attr_val is not None:
+            return self._loads(attr_val)
+        else:
+            return None
+
+    def _template_node(self, root):
+        return self._creation_path.create(root)
+
+    def _fill(self, node, value):
+        node.set(self._attr_name, self._dumps(value))
+
+    def _snapshot_node(self, node):
+        return _shallow_copy(node)
+
+    @_writes
     def __set__(self, inst, value):
-        node = self._nodes.get(inst, None)
+        inst._changing(self)
+
+        node = self._stored_node(inst)
 
         if node is None:
-            node = self._nodes[inst] = inst._etree.find(self._node_path)
+            node = self._store_node(inst, inst._find_node(self))
 
         if inst._cache:
-            self._cached_vals[inst] = value
+            self._cache_value(inst, value)
 
         if node is None:
-            node = self._nodes[inst] = make_path(self._node_path, inst._etree)
+            node = self._store_node(
+                inst, self._creation_path.create(inst._etree))
 
         text_val = self._dumps(value)
         node.set(self._attr_name, text_val)
+        inst._changed(self)
 
+    @_writes
     def __delete__(self, inst):
-        node = self._nodes.get(inst, None)
+        inst._changing(self)
+
+        node = self._stored_node(inst)
 
         if node is None:
-            node = inst._etree.find(self._node_path)
+            node = inst._find_node(self)
 
         if inst._cache:
-            self._cached_vals.pop(inst, None)
+            self._uncache_value(inst)
 
         if node is None:
             raise AttributeError('No such node {0}'.format(self._node_path))
         else:
             node.attrib.pop(self._attr_name)
-            self._nodes.pop(inst, None)
+            self._forget_node(inst)
+            inst._changed(self)
 
     def __repr__(self):
         return ('<XML mapping[{type}] '
@@ -337,16 +1223,21 @@ class AttributeValue(object):
                                                 attr=self._attr_name)
 
 
-class NodeValueListView(object):
+class NodeValueListView(_InstanceStorage):
     def __init__(self, node_path, selector, elem_loads, elem_dumps,
                  always_present=False, full_replace=True,
-                 delete_pred=lambda e: True):
+                 delete_pred=lambda e: True, xpath=False, bulk_dumps=None):
         self._node_path = node_path
         self._selector = selector
+        self._compiled_path = compile_path(node_path, xpath)
+        self._creation_path = parse_path(node_path)
+        self._compiled_selector = compile_path(selector, xpath)
+        self._creation_selector = parse_path(selector)
         self._elem_loads = elem_loads
         self._full_replace = full_replace
 
         self._raw_dumps = elem_dumps
+        self._bulk_dumps = bulk_dumps
 
         self._elem_dumps = self._create_and_dump
 
@@ -358,53 +1249,91 @@ class NodeValueListView(object):
         if existing is not None and not self._full_replace:
             elem = existing
         else:
-            elem = make_elem(self._selector)
+            elem = self._creation_selector.new_elem()
         self._raw_dumps(v, elem)
         return elem
 
     def _child_nodes(self, node):
-        return node.findall(self._selector)
+        return self._compiled_selector.findall(node)
+
+    def _dump_all(self, values):
+        if self._bulk_dumps is not None:
+            return list(self._bulk_dumps(values))
+        else:
+            return [self._elem_dumps(val, None) for val in values]
 
     def __get__(self, inst, type=None):
         if inst is None:
             return self
 
-        node = self._nodes.get(inst, None)
+        node = self._stored_node(inst)
 
         if node is None:
-            node = self._nodes[inst] = inst._etree.find(self._node_path)
+            node = self._store_node(inst, inst._find_node(self))
 
             if node is None:
-                if self._always_present:
-                    node = self._nodes[inst] = make_path(self._node_path,
-                                                         inst._etree)
+                if self._always_present and inst._can_create():
+                    node = self._create_node(inst)
                 else:
                     return None
 
-        return NodeValueListViewInst(inst, self)
+        view = self._stored_wrapper(inst)
+        if view is None:
+            view = self._store_wrapper(inst, NodeValueListViewInst(inst, self))
+
+        return view
+
+    def _extract(self, node, recursive=False):
+        if node is None:
+            return [] if self._always_present else None
+
+        loads = self._elem_loads
+        values = [loads(child) for child in self._child_nodes(node)]
+        if recursive:
+            values = [val.to_dict(recursive=True) if isinstance(val, Model)
+                      else val for val in values]
 
+        return values
+
+    def _template_node(self, root):
+        return self._creation_path.create(root)
+
+    def _fill(self, node, values):
+        values = list(values)
+        act_ind = self._actual_index(0, node, [])
+        node[act_ind:act_ind] = self._dump_all(values)
+
+    @_writes
     def __set__(self, inst, values):
-        node = self._nodes.get(inst, None)
+        # the values might come from this very list
+        values = list(values)
+        inst._changing(self)
+
+        node = self._stored_node(inst)
 
         if node is None:
-            node = self._nodes[inst] = inst._etree.find(self._node_path)
+            node = self._store_node(inst, inst._find_node(self))
 
             if node is None:
-                node = self._nodes[inst] = make_path(self._node_path,
-                                                     inst._etree)
+                node = self._store_node(
+                    inst, self._creation_path.create(inst._etree))
 
-        for cnode in self._child_nodes(node):
+        for cnode in list(self._child_nodes(node)):
             node.remove(cnode)
 
-        view = NodeValueListViewInst(inst, self)
-        for val in values:
-            view.append(val)
+        act_ind = self._actual_index(0, node, [])
+        node[act_ind:act_ind] = self._dump_all(values)
+
+        inst._changed(self, detached=True)
 
+    @_writes
     def __delete__(self, inst):
-        node = self._nodes.get(inst, None)
+        inst._changing(self)
+
+        node = self._stored_node(inst)
 
         if node is None:
-            node = self._nodes[inst] = inst._etree.find(self._node_path)
+            node = self._store_node(inst, inst._find_node(self))
 
         if node is None:
             raise AttributeError('No such node {0}'.format(self._node_path))
@@ -413,8 +1342,11 @@ class NodeValueListView(object):
                 # TODO(sross): use delete_pred here?
                 node.remove(cnode)
 
-    def _actual_index(self, ind, node):
-        child_nodes = self._child_nodes(node)
+            inst._changed(self, detached=True)
+
+    def _actual_index(self, ind, node, child_nodes=None):
+        if child_nodes is None:
+            child_nodes = self._child_nodes(node)
         if len(child_nodes) == 0:
             return len(node)
         if len(child_nodes) <= ind:
@@ -431,10 +1363,38 @@ class NodeValueListView(object):
 
 class NodeValueListViewInst(collections.MutableSequence):
     def __init__(self, inst, parent):
-        # TODO(sross): should this be a weak ref
-        self.inst = inst
+        # views are memoized on the model, so they only hold it weakly
+        # (like sub-models do) to avoid a reference cycle
+        self._inst_ref = weakref.ref(inst)
+        self._stand_in = None
+        self._model_cls = type(inst)
+        self._root = inst._etree
+        self._cache = inst._cache
+        self._lock = inst._lock
         self.parent = parent
 
+        # the matching child elements, along with the model version
+        # and child count they were computed at
+        self._children = None
+        self._stamp = None
+
+    @property
+    def inst(self):
+        inst = self._inst_ref()
+        if inst is not None:
+            return inst
+
+        # the view outlived its model (e.g. `Model(xml).items`), so it
+        # carries on with a model sharing the same tree
+        if self._stand_in is None:
+            stand_in = self._model_cls.__new__(self._model_cls)
+            stand_in._set_root(self._root)
+            stand_in._init_state(self._cache, lock=self._lock)
+            self._stand_in = stand_in
+            self._children = self._stamp = None
+
+        return self._stand_in
+
     def __str__(self):
         return str(list(self))
 
@@ -444,92 +1404,228 @@ class NodeValueListViewInst(collections.MutableSequence):
                                    selector=self.parent._selector,
                                    elems=list(self))
 
+    def _node(self):
+        inst = self.inst
+        node = self.parent._stored_node(inst)
+        if node is None and inst is self._stand_in:
+            node = self.parent._store_node(inst, inst._find_node(self.parent))
+
+        if node is None:
+            raise AttributeError('No such node {0}'.format(
+                self.parent._node_path))
+
+        return node
+
+    def _child_list(self, node):
+        # without caching, anything may have changed the children since
+        # the last operation, so they're looked up again for each one
+        if not self.inst._cache:
+            return list(self.parent._child_nodes(node))
+
+        stamp = (self.inst._version, node, len(node))
+        if self._stamp != stamp:
+            self._children = list(self.parent._child_nodes(node))
+            self._stamp = stamp
+
+        return self._children
+
+    def _mutated(self, node, keep_index=True, detached=False):
+        self.inst._changed(self.parent, detached=detached)
+        if keep_index:
+            self._stamp = (self.inst._version, node, len(node))
+        else:
+            self._children = self._stamp = None
+
+    def invalidate(self):
+        self._children = self._stamp = None
+
+    def _load(self, elem):
+        value = self.parent._elem_loads(elem)
+        if isinstance(value, Model) and value._owner is None:
+            # changes made through the model are changes to the list
+            self.inst._adopt(value, self.parent)
+
+        return value
+
     def __getitem__(self, ind):
-        node = self.parent._nodes.get(self.inst, None)
+        child_nodes = self._child_list(self._node())
         if isinstance(ind, slice):
-            return [self.parent._elem_loads(e) for e
-                    in self.parent._child_nodes(node)[ind]]
+            return [self._load(e) for e in child_nodes[ind]]
         else:
-            return self.parent._elem_loads(self.parent._child_nodes(node)[ind])
+            return self._load(child_nodes[ind])
 
-    def __setitem__(self, ind, value):
-        node = self.parent._nodes.get(self.inst, None)
+    def __iter__(self):
+        for child in list(self._child_list(self._node())):
+            yield self._load(child)
+
+    def __contains__(self, value):
+        for item in self:
+            if item == value:
+                return True
+
+        return False
 
-        child_nodes = self.parent._child_nodes(node)
+    def index(self, value, start=0, stop=None):
+        child_nodes = self._child_list(self._node())
+        start, stop, _ = slice(start, stop).indices(len(child_nodes))
+        for ind in six.moves.range(start, stop):
+            if self._load(child_nodes[ind]) == value:
+                return ind
+
+        raise ValueError('{0!r} is not in list'.format(value))
+
+    def _replace(self, node, child_nodes, ind, value):
+        existing = child_nodes[ind]
+        elem = self.parent._elem_dumps(value, existing)
+        if elem is not existing:
+            node.replace(existing, elem)
+            child_nodes[ind] = elem
+
+    @_view_writes
+    def __setitem__(self, ind, value):
+        self.inst._changing(self.parent)
+        node = self._node()
+        child_nodes = self._child_list(node)
 
         if not isinstance(ind, slice):
-            ind = slice(ind, ind + 1)
+            if ind < 0:
+                ind += len(child_nodes)
+                if ind < 0:
+                    raise IndexError('list assignment index out of range')
+
+            # assigning past the end appends, like insert
+            ind = slice(min(ind, len(child_nodes)), ind + 1)
             value = [value]
+        else:
+            value = list(value)
 
-        for vind, cind in enumerate(six.moves.range(ind.start,
-                                                    ind.stop,
-                                                    ind.step or 1)):
-            act_ind = self.parent._actual_index(cind, node)
-            if len(child_nodes) > cind:
-                existing = child_nodes[cind]
-                child_nodes[cind].getparent().remove(child_nodes[cind])
+        start, stop, step = ind.indices(len(child_nodes))
+
+        if step != 1:
+            inds = six.moves.range(start, stop, step)
+            if len(inds) != len(value):
+                raise ValueError('attempt to assign sequence of size {0} '
+                                 'to extended slice of size {1}'.format(
+                                     len(value), len(inds)))
+
+            for cind, val in zip(inds, value):
+                self._replace(node, child_nodes, cind, val)
+        else:
+            stop = max(start, stop)
+            num_replaced = min(stop - start, len(value))
+            for offset in six.moves.range(num_replaced):
+                self._replace(node, child_nodes, start + offset,
+                              value[offset])
+
+            replaced_end = start + num_replaced
+            if len(value) > num_replaced:
+                act_ind = self.parent._actual_index(replaced_end, node,
+                                                    child_nodes)
+                new_elems = self.parent._dump_all(value[num_replaced:])
+                node[act_ind:act_ind] = new_elems
+                child_nodes[replaced_end:replaced_end] = new_elems
             else:
-                existing = None
+                for cnode in child_nodes[replaced_end:stop]:
+                    node.remove(cnode)
+                del child_nodes[replaced_end:stop]
 
-            node.insert(act_ind, self.parent._elem_dumps(value[vind],
-                                                         existing))
-            child_nodes = self.parent._child_nodes(node)
+        self._mutated(node, keep_index=self.parent._full_replace,
+                      detached=True)
 
+    @_view_writes
     def __delitem__(self, ind):
-        node = self.parent._nodes.get(self.inst, None)
+        self.inst._changing(self.parent)
+        node = self._node()
+        child_nodes = self._child_list(node)
 
-        child_nodes = self.parent._child_nodes(node)
         if isinstance(ind, slice):
-            for cnode in child_nodes[ind]:
-                if self.parent._delete_pred(cnode):
-                    cnode.getparent().remove(cnode)
+            targets = child_nodes[ind]
         else:
-            if self.parent._delete_pred(child_nodes[ind]):
-                child_nodes[ind].getparent().remove(child_nodes[ind])
+            targets = [child_nodes[ind]]
+
+        removed = set()
+        for cnode in targets:
+            if self.parent._delete_pred(cnode):
+                node.remove(cnode)
+                removed.add(cnode)
+
+        child_nodes[:] = [cnode for cnode in child_nodes
+                          if cnode not in removed]
+
+        # elements that the predicate decided to keep may have been
+        # modified such that they no longer match the selector
+        self._mutated(node, keep_index=len(removed) == len(targets),
+                      detached=True)
 
     def __len__(self):
-        node = self.parent._nodes.get(self.inst, None)
-        return len(self.parent._child_nodes(node))
+        return len(self._child_list(self._node()))
 
+    @_view_writes
     def insert(self, ind, value):
-        node = self.parent._nodes.get(self.inst, None)
+        self.inst._changing(self.parent)
+        node = self._node()
+        child_nodes = self._child_list(node)
 
-        if node is None:
-            raise AttributeError('No such node {0}'.format(
-                self.parent._node_path))
-        else:
-            act_ind = self.parent._actual_index(ind, node)
-            node.insert(act_ind, self.parent._elem_dumps(value, None))
+        elem = self.parent._elem_dumps(value, None)
+        node.insert(self.parent._actual_index(ind, node, child_nodes), elem)
+        child_nodes.insert(ind, elem)
+
+        self._mutated(node)
+
+    @_view_writes
+    def extend(self, values):
+        if values is self:
+            values = list(values)
+
+        self.inst._changing(self.parent)
+        node = self._node()
+        child_nodes = self._child_list(node)
+
+        act_ind = self.parent._actual_index(len(child_nodes), node,
+                                            child_nodes)
+        new_elems = self.parent._dump_all(values)
+        node[act_ind:act_ind] = new_elems
+        child_nodes.extend(new_elems)
+
+        self._mutated(node)
 
 
 class NodeValueList(NodeValueListView):
     def __init__(self, node_path, elem_loads, elem_dumps,
-                 always_present=False):
+                 always_present=False, xpath=False, bulk_dumps=None):
         self._node_path = node_path
+        self._compiled_path = compile_path(node_path, xpath)
+        self._creation_path = parse_path(node_path)
         self._elem_loads = elem_loads
         self._elem_dumps = lambda v, existing=None: elem_dumps(v)
+        self._bulk_dumps = bulk_dumps
         self._nodes = weakref.WeakKeyDictionary()
         self._always_present = always_present
         self._full_replace = True
         self._selector = '*'  # for repr
         self._delete_pred = lambda e: True
 
+    @_writes
     def __delete__(self, inst):
-        node = self._nodes.get(inst, None)
+        inst._changing(self)
+
+        node = self._stored_node(inst)
 
         if node is None:
-            node = self._nodes[inst] = inst._etree.find(self._node_path)
+            node = self._store_node(inst, inst._find_node(self))
 
         if node is None:
             raise AttributeError('No such node {0}'.format(self._node_path))
         else:
             node.getparent().remove(node)
-            self._nodes.pop(inst, None)
+            self._forget_node(inst)
+            self._forget_wrapper(inst)
+            inst._changed(self, detached=True)
 
     def _child_nodes(self, node):
         return node
 
-    def _actual_index(self, ind, node):
+    def _actual_index(self, ind, node, child_nodes=None):
         return ind
 
     def __repr__(self):
@@ -537,44 +1633,873 @@ class NodeValueList(NodeValueListView):
             type=type(self).__name__, path=self._node_path)
 
 
+_MAPPING_TYPES = (CustomNodeValue, ModelNodeValue, AttributeValue,
+                  NodeValueListView)
+_CACHING_TYPES = (CustomNodeValue, ModelNodeValue, AttributeValue)
+
+
+class _StepIndex(object):
+    """Indexes mappings by the tags of their paths.
+
+    Two paths may overlap when each tag of the shorter one matches the
+    corresponding tag of the longer one (with '*' matching anything), so
+    the overlapping mappings are found by walking down the index instead
+    of comparing every pair of paths.
+    """
+
+    __slots__ = ('children', 'descs', '_below')
+
+    def __init__(self):
+        self.children = {}
+        self.descs = []
+        self._below = None
+
+    def add(self, desc, steps):
+        node = self
+        for tag, _ in steps:
+            child = node.children.get(tag, None)
+            if child is None:
+                child = node.children[tag] = _StepIndex()
+
+            node = child
+
+        node.descs.append(desc)
+
+    def below(self):
+        """Gets the mappings at or beneath this node."""
+        if self._below is None:
+            self._below = list(self.descs)
+            for child in self.children.values():
+                self._below.extend(child.below())
+
+        return self._below
+
+    def overlapping(self, steps):
+        """Finds the mappings whose paths may overlap with `steps`.
+
+        The mappings with shorter paths are returned separately from the
+        nested ones (whose paths are at least as long).
+        """
+        shorter = []
+        nodes = [self]
+        for tag, _ in steps:
+            next_nodes = []
+            for node in nodes:
+                shorter.extend(node.descs)
+                if tag == '*':
+                    next_nodes.extend(node.children.values())
+                    continue
+
+                for key in (tag, '*'):
+                    child = node.children.get(key, None)
+                    if child is not None:
+                        next_nodes.append(child)
+
+            nodes = next_nodes
+
+        nested = []
+        for node in nodes:
+            nested.extend(node.below())
+
+        return shorter, nested
+
+
+class ModelMeta(type):
+    """Collects the mapping descriptors of a model into an accessor plan."""
+
+    def __init__(cls, name, bases, attrs):
+        super(ModelMeta, cls).__init__(name, bases, attrs)
+        cls._build_plan()
+
+    def _build_plan(cls):
+        descriptors = collections.OrderedDict()
+        for klass in reversed(cls.__mro__):
+            for attr_name, val in vars(klass).items():
+                if isinstance(val, _MAPPING_TYPES):
+                    descriptors[attr_name] = val
+                elif attr_name in descriptors:
+                    del descriptors[attr_name]
+
+        # a descriptor may be mapped under several names, but only gets
+        # a single slot
+        slot_map = {}
+        for desc in descriptors.values():
+            slot_map.setdefault(desc, len(slot_map))
+
+        type.__setattr__(cls, '_descriptors', descriptors)
+        type.__setattr__(cls, '_slot_map', slot_map)
+        type.__setattr__(cls, '_templates', {})
+
+        # the other mappings whose cached values or nodes may be
+        # affected by a modification through each mapping
+        index = _StepIndex()
+        # `None` steps (unparseable paths) might overlap with anything
+        unparsed = []
+        for desc in descriptors.values():
+            steps = desc._creation_path.steps
+            if steps is None:
+                unparsed.append(desc)
+            else:
+                index.add(desc, steps)
+
+        def others(found, desc):
+            found = set(found)
+            found.discard(desc)
+            return sorted(found, key=slot_map.__getitem__)
+
+        overlaps = {}
+        nested = {}
+        for desc in descriptors.values():
+            steps = desc._creation_path.steps
+            if steps is None:
+                shorter, found = [], list(descriptors.values())
+            else:
+                shorter, found = index.overlapping(steps)
+                found.extend(unparsed)
+
+            overlaps[desc] = tuple(
+                other for other in others(shorter + found, desc)
+                if isinstance(other, _CACHING_TYPES))
+            nested[desc] = tuple(others(found, desc))
+
+        type.__setattr__(cls, '_overlaps', overlaps)
+        type.__setattr__(cls, '_nested', nested)
+        type.__setattr__(cls, '_projection', None)
+
+        for subcls in type.__subclasses__(cls):
+            subcls._build_plan()
+
+    def __setattr__(cls, name, value):
+        super(ModelMeta, cls).__setattr__(name, value)
+        descriptors = cls.__dict__.get('_descriptors', ())
+        if isinstance(value, _MAPPING_TYPES) or name in descriptors:
+            cls._build_plan()
+
+    def __delattr__(cls, name):
+        super(ModelMeta, cls).__delattr__(name)
+        if name in cls.__dict__.get('_descriptors', ()):
+            cls._build_plan()
+
+
+_NO_SLOTS = {}
+
+# the positional arguments of `etree.tostring`, after the element
+_TOSTRING_ARGS = ('encoding', 'method', 'xml_declaration', 'pretty_print',
+                  'with_tail', 'standalone')
+
+_FINGERPRINTS = ('tree', 'fields')
+
+
+def _canonical_bytes(elem):
+    # libxml2's (exclusive) C14N 1.0 is much faster than lxml's C14N 2.0,
+    # but refuses relative namespace URIs
+    try:
+        return etree.tostring(elem, method='c14n', exclusive=True,
+                              with_comments=False)
+    except etree.C14NError:
+        return etree.tostring(elem, method='c14n2')
+
+
+def _normalized(value):
+    # gives mapped values a deterministic representation
+    if isinstance(value, dict):
+        return tuple(sorted((key, _normalized(val))
+                            for key, val in value.items()))
+    elif isinstance(value, (list, tuple)):
+        return tuple(_normalized(val) for val in value)
+    elif isinstance(value, etree._Element):
+        return _canonical_bytes(value)
+    else:
+        return value
+
+
+class _JournalEntry(object):
+    """The state of a mapping from before it was first modified."""
+
+    __slots__ = ('old', 'path', 'anchor', 'anchor_path')
+
+    def __init__(self, inst, desc):
+        root = inst._etree
+        tree = root.getroottree()
+
+        node = desc._compiled_path.find(root)
+        if node is not None:
+            self.old = desc._snapshot_node(node)
+            self.path = tree.getpath(node)
+            self.anchor = self.anchor_path = None
+        else:
+            # remember where the missing node would be created, so
+            # that we can add it there in a patch
+            steps = desc._creation_path.steps
+            if steps:
+                anchor, _ = desc._creation_path._deepest(root, steps, 0)
+            else:
+                anchor = root
+
+            self.old = self.path = None
+            self.anchor = anchor
+            self.anchor_path = tree.getpath(anchor)
+
+
+@six.add_metaclass(ModelMeta)
 class Model(object):
     ROOT_ELEM = 'elem'
+    SLOT_STORAGE = False
+    PARSER_OPTIONS = None
+    XML_OPTIONS = None
+    TRACK_CHANGES = False
+    THREAD_SAFE = False
+    FINGERPRINT = 'tree'
+    STRUCTURAL_EQ = False
+
+    __slots__ = ('_etree', '_source', '_cache', '_slot_index', '_node_slots',
+                 '_value_slots', '_version', '_journal', '_owner', '_wrappers',
+                 '_lock', '_serialized', '__weakref__')
 
     def __init__(self, content=None, cache=False):
         if content is None:
-            self._etree = etree.Element(self.ROOT_ELEM)
+            root = etree.Element(self.ROOT_ELEM)
         elif isinstance(content, six.string_types):
-            self._etree = etree.fromstring(content)
+            root = etree.fromstring(content, self._parser())
         else:
-            self._etree = content
+            root = content
+
+        self._set_root(root)
+        self._init_state(cache)
 
-        if self._etree.tag != self.ROOT_ELEM:
+    @classmethod
+    def _check_root(cls, root):
+        if root.tag != cls.ROOT_ELEM:
             raise ValueError('This model should have a root tag of {root}, '
                              'but the input had a root tag of {actual}'.format(
-                                 root=self.ROOT_ELEM,
-                                 actual=self._etree.tag))
+                                 root=cls.ROOT_ELEM,
+                                 actual=root.tag))
+
+    def _set_root(self, root):
+        self._check_root(root)
+        self._etree = root
 
+    def _init_state(self, cache, source=None, lock=None):
+        if lock is None and self.THREAD_SAFE:
+            lock = locking.RWLock()
+
+        self._lock = lock
+        self._source = source
         self._cache = cache
+        self._version = 0
+        self._owner = None
+        self._wrappers = None
+        self._serialized = None
+
+        if self.TRACK_CHANGES:
+            self._journal = collections.OrderedDict()
+        else:
+            self._journal = None
+
+        # shared models keep everything per-instance, so that reading
+        # them never modifies the descriptors, as do models which compare
+        # by content (since equal models would share the descriptors'
+        # entries, which would also be orphaned by changes to their hash)
+        if self.SLOT_STORAGE or self.STRUCTURAL_EQ or lock is not None:
+            self._use_slots()
+        else:
+            self._slot_index = _NO_SLOTS
+            self._node_slots = self._value_slots = None
+
+    def _use_slots(self):
+        self._slot_index = self._slot_map
+        self._node_slots = [None] * len(self._slot_map)
+        self._value_slots = [_UNCACHED] * len(self._slot_map)
+
+    def __copy__(self):
+        # copies share the tree, but none of the per-instance state
+        res = type(self).__new__(type(self))
+        res._set_root(self._etree)
+        res._init_state(self._cache)
+        return res
+
+    def __deepcopy__(self, memo):
+        res = type(self).__new__(type(self))
+        res._set_root(copy.deepcopy(self._etree, memo))
+        res._init_state(self._cache)
+        return res
+
+    def __getattr__(self, name):
+        # only called when `_etree` hasn't been set yet, which means
+        # that we're deferring parsing until the tree is first needed
+        if name == '_etree' and self._source is not None:
+            if self._lock is None:
+                return self._load_source()
+
+            # (readers may get here too, so this can't take the lock
+            # for writing, but no reader can have seen the tree yet)
+            with self._lock.initializing():
+                return self._load_source()
+
+        raise AttributeError("'{type}' object has no attribute "
+                             "'{name}'".format(type=type(self).__name__,
+                                               name=name))
+
+    def _load_source(self):
+        # another thread may have parsed it while we waited for the lock
+        source, self._source = self._source, None
+        if source is not None:
+            self._set_root(source())
+
+        return self._etree
+
+    @classmethod
+    def _parser(cls, project=False, shared=True):
+        if project:
+            if cls._projection is None:
+                type.__setattr__(cls, '_projection', Projection(cls))
+
+            if not cls._projection.keeps_all:
+                target = _ProjectionTarget(cls._projection)
+                return etree.XMLParser(
+                    target=target,
+                    **parsers.parser_options(cls.PARSER_OPTIONS))
+
+        if shared:
+            return parsers.get_parser(cls.PARSER_OPTIONS)
+        else:
+            return etree.XMLParser(
+                **parsers.parser_options(cls.PARSER_OPTIONS))
+
+    @classmethod
+    def _from_source(cls, parse, cache, lazy):
+        model = cls.__new__(cls)
+        if lazy:
+            model._init_state(cache, source=parse)
+        else:
+            model._set_root(parse())
+            model._init_state(cache)
+
+        return model
+
+    @classmethod
+    def from_bytes(cls, data, cache=False, lazy=False, project=False):
+        """Creates a model from bytes or any object supporting buffers."""
+        return cls._from_source(
+            lambda: etree.fromstring(data, cls._parser(project)), cache, lazy)
+
+    @classmethod
+    def from_file(cls, source, cache=False, lazy=False, project=False):
+        """Creates a model from a file name, URL, or file-like object."""
+        def parse():
+            res = etree.parse(source, cls._parser(project))
+            # target parsers return the root element directly
+            if isinstance(res, etree._ElementTree):
+                return res.getroot()
+            else:
+                return res
+
+        return cls._from_source(parse, cache, lazy)
+
+    @classmethod
+    def from_mmap(cls, source, cache=False, lazy=False, project=False):
+        """Creates a model by memory-mapping a file name or file object."""
+        def parse():
+            if isinstance(source, mmap.mmap):
+                return etree.fromstring(source, cls._parser(project))
+
+            if isinstance(source, six.string_types):
+                source_file = open(source, 'rb')
+            else:
+                source_file = source
+
+            try:
+                mapped = mmap.mmap(source_file.fileno(), 0,
+                                   access=mmap.ACCESS_READ)
+                try:
+                    return etree.fromstring(mapped, cls._parser(project))
+                finally:
+                    mapped.close()
+            finally:
+                if source_file is not source:
+                    source_file.close()
+
+        return cls._from_source(parse, cache, lazy)
+
+    def _find_node(self, desc):
+        # each node is looked up when its mapping is first accessed, since
+        # lxml's compiled lookups are cheaper than walking the tree for
+        # every mapping up front (see `AccessorPlan`)
+        return desc._compiled_path.find(self._etree)
+
+    @classmethod
+    def field_names(cls):
+        """Gets the names of the mapped fields, in `to_dict` order."""
+        return list(cls._descriptors)
+
+    @classmethod
+    def _extract(cls, root, recursive=False, as_tuple=False):
+        values = [desc._extract(desc._compiled_path.find(root), recursive)
+                  for desc in cls._descriptors.values()]
+
+        if as_tuple:
+            return tuple(values)
+        else:
+            return dict(zip(cls._descriptors, values))
+
+    def to_dict(self, recursive=False):
+        """Loads all of the mapped fields into a dict.
+
+        The tree is walked once for all of the fields, without populating
+        the per-field node or value caches.  Missing nodes are returned as
+        `None` (and are not created).  When `recursive` is set, sub-models
+        (including those in lists) are converted to dicts as well.
+        """
+        return self._extract(self._etree, recursive)
+
+    @classmethod
+    def load_many(cls, elements, recursive=False, as_tuples=False):
+        """Loads the mapped fields of many records at once.
+
+        `elements` may contain root elements for this model, or models
+        (such as those yielded by `iterparse`).  A list of dicts is
+        returned, or of tuples ordered like `field_names()` if `as_tuples`
+        is set.
+        """
+        results = []
+        for elem in elements:
+            if isinstance(elem, Model):
+                elem = elem._etree
+
+            cls._check_root(elem)
+            results.append(cls._extract(elem, recursive, as_tuples))
+
+        return results
+
+    @classmethod
+    def _template(cls, names):
+        template = cls._templates.get(names, None)
+        if template is None:
+            unknown = names.difference(cls._descriptors)
+            if unknown:
+                raise ValueError('{model} has no field(s) {names}'.format(
+                    model=cls.__name__, names=', '.join(sorted(unknown))))
+
+            template = cls._templates[names] = ModelTemplate(cls, names)
+
+        return template
+
+    @classmethod
+    def from_dict(cls, data, cache=False):
+        """Builds a new model from a dict of field values.
+
+        The element skeleton for each distinct set of fields is built once
+        and then copied for every model, so building many models with the
+        same fields is much faster than assigning each field in turn.
+        Fields whose value is `None` are left out.  Sub-model fields may be
+        given as models or as dicts.
+        """
+        values = dict((name, val) for name, val in data.items()
+                      if val is not None)
+        root = cls._template(frozenset(values)).build(values)
+        return cls(root, cache=cache)
+
+    @classmethod
+    def build_many(cls, rows, cache=False):
+        """Builds a list of new models from an iterable of dicts."""
+        return [cls.from_dict(row, cache=cache) for row in rows]
+
+    def _changed(self, desc=None, detached=False):
+        """Records that the tree was modified through a mapping.
+
+        `detached` indicates that the modification removed or replaced
+        nodes, so that nodes found beneath them must be looked up again.
+        """
+        self._version += 1
+
+        if desc is not None:
+            if self._cache:
+                for other in self._overlaps.get(desc, ()):
+                    other._uncache_value(self)
+
+                    # memoized sub-models keep values of their own
+                    wrapper = other._stored_wrapper(self)
+                    if wrapper is not None:
+                        wrapper._forget_cached()
+
+            if detached:
+                for other in self._nested.get(desc, ()):
+                    other._forget_node(self)
+
+        if self._owner is not None:
+            owner_ref, owner_desc = self._owner
+            owner = owner_ref()
+            if owner is not None:
+                owner._changed(owner_desc, detached=detached)
+
+    def invalidate(self):
+        """Forgets all cached values and nodes.
+
+        This should be called after modifying the element tree directly,
+        rather than through the mappings.
+        """
+        self._forget_cached()
+        self._wrappers = None
+        self._changed()
+
+    def _forget_cached(self):
+        for desc in self._descriptors.values():
+            desc._forget_node(self)
+            if isinstance(desc, _CACHING_TYPES):
+                desc._uncache_value(self)
+
+        if self._wrappers is not None:
+            for wrapper in self._wrappers.values():
+                if isinstance(wrapper, Model):
+                    wrapper._forget_cached()
+                else:
+                    wrapper.invalidate()
+
+    def _changing(self, desc):
+        """Records the state of a mapping before it is first modified."""
+        if self._owner is not None:
+            owner_ref, owner_desc = self._owner
+            owner = owner_ref()
+            if owner is not None:
+                owner._changing(owner_desc)
+
+        journal = self._journal
+        if journal is not None and desc not in journal:
+            journal[desc] = _JournalEntry(self, desc)
+
+    def _adopt(self, model, desc):
+        # changes to sub-models are changes to the owning mapping,
+        # and are guarded by the owner's lock
+        model._owner = (weakref.ref(self), desc)
+        model._lock = self._lock
+        if self._lock is not None and model._slot_index is _NO_SLOTS:
+            model._use_slots()
+
+        return model
+
+    def _can_create(self):
+        # missing nodes aren't created on frozen models, or while
+        # holding the lock for reading (which can't start writing)
+        return self._lock is None or self._lock.can_write()
+
+    def reading(self):
+        """Holds off modifications from other threads while reading.
+
+        This returns a context manager, which does nothing for models
+        which aren't `THREAD_SAFE`.
+        """
+        return (self._lock or locking.NO_LOCK).reading()
+
+    def writing(self):
+        """Makes several modifications without other threads interleaving.
+
+        This returns a context manager, which does nothing for models
+        which aren't `THREAD_SAFE`.
+        """
+        return (self._lock or locking.NO_LOCK).writing()
+
+    def freeze(self):
+        """Makes an immutable copy of the model.
+
+        The copy caches its values and never creates missing nodes, so it
+        may be read from any number of threads without locking.  Any attempt
+        to modify it (or its sub-models and lists) raises a `TypeError`.
+        """
+        with self.reading():
+            root = copy.deepcopy(self._etree)
+
+        frozen = type(self).__new__(type(self))
+        frozen._set_root(root)
+        frozen._init_state(True, lock=locking.FROZEN)
+        return frozen
+
+    def _tracked_changes(self):
+        if self._journal is None:
+            raise ValueError('Change tracking is not enabled for '
+                             '{0}'.format(type(self).__name__))
+
+        names = dict((desc, name) for name, desc
+                     in self._descriptors.items())
+        for desc, entry in self._journal.items():
+            name = names.get(desc, None)
+            if name is not None:
+                yield name, desc, entry
+
+    def changed_fields(self):
+        """Gets the names of the fields modified since tracking began.
+
+        Fields are listed in the order in which they were first modified.
+        """
+        return [name for name, _, _ in self._tracked_changes()]
+
+    def diff(self):
+        """Gets the old and new values of each field which has changed."""
+        res = {}
+        for name, desc, entry in self._tracked_changes():
+            old = desc._extract(entry.old, recursive=True)
+            new = desc._extract(desc._compiled_path.find(self._etree),
+                                recursive=True)
+            if old != new:
+                res[name] = (old, new)
+
+        return res
+
+    def patch(self):
+        """Builds an XML patch (RFC 5261) for the changes to this model.
+
+        Nodes are selected by their positions in the document when they were
+        first changed, and missing nodes are added (along with any missing
+        ancestors) under their deepest existing ancestor.
+        """
+        tree = self._etree.getroottree()
+        res = etree.Element('diff')
+
+        # elements which are already included in full in an operation
+        included = set()
+
+        def add_op(op, sel, elem=None, **attrs):
+            op_elem = etree.SubElement(res, op, sel=sel, **attrs)
+            if elem is not None:
+                op_elem.append(copy.deepcopy(elem))
+                included.add(elem)
+
+            return op_elem
+
+        def is_included(elem):
+            return any(parent in included
+                       for parent in elem.iterancestors())
+
+        for name, desc, entry in self._tracked_changes():
+            node = desc._compiled_path.find(self._etree)
+            if node is not None and (node in included or is_included(node)):
+                continue
+
+            if entry.path is None:
+                if node is None:
+                    continue
+
+                # find the outermost newly created element
+                added, parent = node, node.getparent()
+                while parent is not None and parent is not entry.anchor:
+                    added, parent = parent, parent.getparent()
+
+                if parent is None:
+                    add_op('replace', tree.getpath(node), node)
+                elif added not in included:
+                    add_op('add', entry.anchor_path, added)
+            elif isinstance(desc, AttributeValue):
+                attr = desc._attr_name
+                old_val = entry.old.get(attr, None)
+                new_val = node.get(attr, None) if node is not None else None
+                if old_val == new_val:
+                    continue
+
+                attr_sel = '{0}/@{1}'.format(entry.path, attr)
+                if new_val is None:
+                    add_op('remove', attr_sel)
+                elif old_val is None:
+                    add_op('add', entry.path, type='@' + attr).text = new_val
+                else:
+                    add_op('replace', attr_sel).text = new_val
+            elif node is None:
+                add_op('remove', entry.path)
+            else:
+                old_val = desc._extract(entry.old, recursive=True)
+                if old_val != desc._extract(node, recursive=True):
+                    add_op('replace', entry.path, node)
+
+        return res
+
+    def clear_changes(self):
+        """Forgets the changes made so far (e.g. once they've been saved)."""
+        if self._journal is None:
+            raise ValueError('Change tracking is not enabled for '
+                             '{0}'.format(type(self).__name__))
+
+        self._journal.clear()
+
+    @classmethod
+    def iterparse(cls, source, tag=None, cache=False, where=None, **kwargs):
+        """Incrementally parse a document, yielding one model per record.
+
+        Each yielded model is only valid until the next one is requested:
+        processed records are cleared and detached from the partial tree so
+        that memory usage stays proportional to a single record.
+
+        `where` maps field names to the values (or to predicates on the
+        values) that a record must have to be yielded.  Records which don't
+        match are discarded without being wrapped in a model.
+        """
+        if tag is None:
+            tag = cls.ROOT_ELEM
+
+        options = parsers.iterparse_options(cls.PARSER_OPTIONS)
+        options.update(kwargs)
+
+        matches = _RecordFilter(cls, where) if where else None
+
+        for _, elem in etree.iterparse(source, events=('end',), tag=tag,
+                                       **options):
+            if matches is None or matches(elem):
+                yield cls(elem, cache=cache)
+
+            elem.clear()
+            while elem.getprevious() is not None:
+                del elem.getparent()[0]
+
+    @classmethod
+    def from_async_stream(cls, stream, cache=False, project=False, **kwargs):
+        """Creates a model from an asynchronous stream of bytes.
+
+        This returns a coroutine (see `xmlmapper.aio.from_async_stream`),
+        and is only available on Python 3.6+.
+        """
+        # imported here, since the module isn't valid Python 2
+        from xmlmapper import aio
+        return aio.from_async_stream(cls, stream, cache=cache,
+                                     project=project, **kwargs)
+
+    @classmethod
+    def aiterparse(cls, stream, tag=None, cache=False, where=None,
+                   **kwargs):
+        """Incrementally parse an asynchronous stream of bytes.
+
+        This returns an async iterator of models (see
+        `xmlmapper.aio.aiterparse`), and is only available on Python 3.6+.
+        """
+        from xmlmapper import aio
+        return aio.aiterparse(cls, stream, tag=tag, cache=cache, where=where,
+                              **kwargs)
 
     def __str__(self):
         if six.PY2:
             return self.to_xml()
         else:
-            return self.to_xml(encoding=str)
+            return self.__unicode__()
 
     def __bytes__(self):
         return self.to_xml()
 
     def __unicode__(self):
-        return self.to_xml(encoding=six.text_type)
+        return self._memoized('text', self._to_text)
+
+    def _to_text(self):
+        options = self._xml_options({'encoding': six.text_type})
+        # declarations can't be written when serializing to text
+        options.pop('xml_declaration', None)
+        return etree.tostring(self._etree, **options)
+
+    def _xml_options(self, kwargs):
+        options = dict(self.XML_OPTIONS or {})
+        options.update(kwargs)
+        return options
+
+    def _stamp(self):
+        # sub-models share their owners' trees, which may be modified
+        # through the owners' mappings
+        stamp = [self._version]
+        owner = self._owner
+        while owner is not None:
+            model = owner[0]()
+            if model is None:
+                break
+
+            stamp.append(model._version)
+            owner = model._owner
+
+        return tuple(stamp)
+
+    def _memoized(self, key, serialize):
+        if not self._cache:
+            return serialize()
+
+        stamp = self._stamp()
+        memo = self._serialized
+        if memo is None or memo[0] != stamp:
+            memo = self._serialized = (stamp, {})
+
+        res = memo[1].get(key, None)
+        if res is None:
+            res = memo[1][key] = serialize()
+
+        return res
 
     def to_xml(self, *args, **kwargs):
-        return etree.tostring(self._etree, *args, **kwargs)
+        """Serializes the model, using the class's `XML_OPTIONS`.
+
+        The arguments are those of `etree.tostring`, and override the
+        defaults from `XML_OPTIONS`.
+        """
+        if args or kwargs:
+            kwargs.update(zip(_TOSTRING_ARGS, args))
+            return etree.tostring(self._etree, **self._xml_options(kwargs))
+
+        return self._memoized(
+            'bytes',
+            lambda: etree.tostring(self._etree, **self._xml_options({})))
+
+    def write(self, output, **kwargs):
+        """Serializes the model straight to a file name or file object.
+
+        The arguments are those of `ElementTree.write`, and override the
+        defaults from `XML_OPTIONS`.
+        """
+        tree = etree.ElementTree(self._etree)
+        tree.write(output, **self._xml_options(kwargs))
+
+    def canonical(self, with_comments=False):
+        """Serializes the model in canonical form (C14N 2.0).
+
+        Equivalent trees always have the same canonical form, regardless
+        of attribute order, quoting, or how empty elements were written,
+        which makes it suitable for hashing and comparison.
+        """
+        return self._memoized(
+            ('c14n', with_comments),
+            lambda: etree.tostring(self._etree, method='c14n2',
+                                   with_comments=with_comments))
+
+    def _identity(self):
+        if self.FINGERPRINT not in _FINGERPRINTS:
+            raise ValueError("Unknown fingerprint '{kind}' (expected one of "
+                             "{kinds})".format(kind=self.FINGERPRINT,
+                                               kinds=_FINGERPRINTS))
+
+        def identity():
+            if self.FINGERPRINT == 'tree':
+                return _canonical_bytes(self._etree)
+
+            values = self._extract(self._etree, recursive=True,
+                                   as_tuple=True)
+            fields = tuple(zip(self._descriptors, _normalized(values)))
+            return repr(fields).encode('utf-8')
+
+        return self._memoized('identity', identity)
+
+    def fingerprint(self):
+        """Gets a hash of the content of the model, as a hex string.
+
+        When `FINGERPRINT` is 'tree' (the default), the canonical form of
+        the whole element tree is hashed, so equivalent documents have the
+        same fingerprint however they were written.  When it is 'fields',
+        only the values of the mapped fields are hashed, ignoring any
+        unmapped content.  For models created with `cache=True`, the
+        fingerprint is remembered until the model is modified through
+        a mapping.
+        """
+        return self._memoized(
+            'fingerprint',
+            lambda: hashlib.sha1(self._identity()).hexdigest())
 
     def __eq__(self, other):
         if not isinstance(other, type(self)):
             return False
 
+        if self is other:
+            return True
+        elif self.STRUCTURAL_EQ:
+            return self._identity() == other._identity()
+
         return self._etree == other._etree
 
     def __ne__(self, other):
@@ -586,4 +2511,7 @@ class Model(object):
                                            cache=self._cache)
 
     def __hash__(self):
+        if self.STRUCTURAL_EQ:
+            return hash(self.fingerprint())
+
         return hash(self._etree)
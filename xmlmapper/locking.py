@@ -0,0 +1,156 @@
+import contextlib
+import threading
+
+from six.moves import _thread
+
+
+class RWLock(object):
+    """A reader-writer lock which prefers writers.
+
+    Any number of threads may hold the lock for reading at once, while
+    writing requires exclusive access.  Both sides are reentrant, and the
+    thread holding the lock for writing may also read, but a thread which
+    is only reading cannot start writing (since two such threads would
+    wait for each other forever).
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        # thread ident --> number of nested read acquisitions
+        self._readers = {}
+        self._writer = None
+        self._writes = 0
+        self._waiting_writers = 0
+        self._init_lock = threading.Lock()
+
+    def acquire_read(self):
+        me = _thread.get_ident()
+        with self._cond:
+            if self._writer == me or me in self._readers:
+                self._readers[me] = self._readers.get(me, 0) + 1
+                return
+
+            while self._writer is not None or self._waiting_writers:
+                self._cond.wait()
+
+            self._readers[me] = 1
+
+    def release_read(self):
+        me = _thread.get_ident()
+        with self._cond:
+            count = self._readers.get(me, 0)
+            if not count:
+                raise RuntimeError('Cannot release a read lock which is '
+                                   'not held')
+            elif count > 1:
+                self._readers[me] = count - 1
+            else:
+                del self._readers[me]
+                if not self._readers:
+                    self._cond.notify_all()
+
+    def acquire_write(self):
+        me = _thread.get_ident()
+        with self._cond:
+            if self._writer == me:
+                self._writes += 1
+                return
+
+            if me in self._readers:
+                raise RuntimeError('Cannot start writing while holding '
+                                   'the lock for reading')
+
+            self._waiting_writers += 1
+            try:
+                while self._writer is not None or self._readers:
+                    self._cond.wait()
+            finally:
+                self._waiting_writers -= 1
+
+            self._writer = me
+            self._writes = 1
+
+    def release_write(self):
+        with self._cond:
+            if self._writer != _thread.get_ident():
+                raise RuntimeError('Cannot release a write lock which is '
+                                   'not held')
+
+            self._writes -= 1
+            if not self._writes:
+                self._writer = None
+                self._cond.notify_all()
+
+    def can_write(self):
+        """Checks whether the current thread may start writing.
+
+        This is only false while the thread holds the lock for reading
+        (without also holding it for writing).
+        """
+        me = _thread.get_ident()
+        with self._cond:
+            return self._writer == me or me not in self._readers
+
+    def initializing(self):
+        """Guards the one-off initialization of state no reader has seen.
+
+        Unlike writing, this may be entered while reading, since it only
+        excludes other threads initializing the same state.
+        """
+        return self._init_lock
+
+    @contextlib.contextmanager
+    def reading(self):
+        self.acquire_read()
+        try:
+            yield
+        finally:
+            self.release_read()
+
+    @contextlib.contextmanager
+    def writing(self):
+        self.acquire_write()
+        try:
+            yield
+        finally:
+            self.release_write()
+
+
+class _NullContext(object):
+    def __enter__(self):
+        return None
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+class _NoLock(object):
+    """Stands in for the lock of models which aren't shared."""
+
+    _context = _NullContext()
+
+    def reading(self):
+        return self._context
+
+    def writing(self):
+        return self._context
+
+    def initializing(self):
+        return self._context
+
+    def can_write(self):
+        return True
+
+
+class _FrozenLock(_NoLock):
+    """Stands in for the lock of frozen models, refusing all writes."""
+
+    def writing(self):
+        raise TypeError('Frozen models cannot be modified')
+
+    def can_write(self):
+        return False
+
+
+NO_LOCK = _NoLock()
+FROZEN = _FrozenLock()
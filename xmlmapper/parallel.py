@@ -0,0 +1,111 @@
+import multiprocessing
+
+from xmlmapper import core_modeler as cm
+
+
+_OUTPUTS = ('dict', 'bytes')
+
+
+class _FileMapper(object):
+    """Parses and maps a single file (in whichever process it's called)."""
+
+    def __init__(self, model_cls, fn, output, project):
+        self.model_cls = model_cls
+        self.fn = fn
+        self.output = output
+        self.project = project
+
+    def __call__(self, path):
+        res = self.model_cls.from_file(path, project=self.project)
+        if self.fn is not None:
+            res = self.fn(res)
+
+        # models can't be pickled, so they're sent back in their
+        # chosen form, while anything else is sent back as is
+        if isinstance(res, cm.Model):
+            if self.output == 'dict':
+                res = res.to_dict(recursive=True)
+            else:
+                res = res.to_xml()
+
+        return path, res
+
+
+# the mapper for the worker processes, set up once by `_init_worker`
+_mapper = None
+
+
+def _init_worker(mapper):
+    global _mapper
+    _mapper = mapper
+
+
+def _map_file(path):
+    return _mapper(path)
+
+
+def _default_chunksize(paths, workers):
+    try:
+        num_paths = len(paths)
+    except TypeError:
+        return 1
+
+    # like `Pool.map`, aim for about four chunks per worker
+    chunksize, extra = divmod(num_paths, workers * 4)
+    return chunksize + 1 if extra else max(chunksize, 1)
+
+
+def map_files(model_cls, paths, fn=None, workers=None, chunksize=None,
+              ordered=True, output='dict', project=False):
+    """Parses and maps many files in a pool of worker processes.
+
+    Each file in `paths` is parsed into a `model_cls` (with `from_file`, so
+    `project` may be used to build only the mapped parts) and passed to
+    `fn` in a worker process.  `fn` must be picklable (e.g. a module level
+    function), and its result is sent back to this process.  If it returns
+    a model (or if `fn` is `None`), the model is sent back as a dict from
+    `to_dict(recursive=True)` when `output` is 'dict', or as serialized XML
+    bytes when `output` is 'bytes'.
+
+    An iterator of `(path, result)` pairs is returned, in the order of
+    `paths` when `ordered` is set, or as the results become available
+    otherwise.  `workers` defaults to the number of CPUs; with a single
+    worker, the files are mapped in this process instead.  Paths are sent
+    to the workers in chunks of `chunksize` (by default, about four chunks
+    per worker).  An exception raised while mapping any file is raised
+    here, and the remaining work is abandoned.
+    """
+    if output not in _OUTPUTS:
+        raise ValueError("Unknown output '{output}' (expected 'dict' or "
+                         "'bytes')".format(output=output))
+
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+
+    mapper = _FileMapper(model_cls, fn, output, project)
+    if workers <= 1:
+        return (mapper(path) for path in paths)
+
+    if chunksize is None:
+        chunksize = _default_chunksize(paths, workers)
+
+    return _map_in_pool(mapper, paths, workers, chunksize, ordered)
+
+
+def _map_in_pool(mapper, paths, workers, chunksize, ordered):
+    pool = multiprocessing.Pool(workers, initializer=_init_worker,
+                                initargs=(mapper,))
+    try:
+        if ordered:
+            results = pool.imap(_map_file, paths, chunksize)
+        else:
+            results = pool.imap_unordered(_map_file, paths, chunksize)
+
+        for res in results:
+            yield res
+
+        pool.close()
+    finally:
+        # stops any outstanding work if we failed or were abandoned
+        pool.terminate()
+        pool.join()
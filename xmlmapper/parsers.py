@@ -0,0 +1,75 @@
+import threading
+
+from lxml import etree
+
+
+_default_options = {}
+_local = threading.local()
+
+# the parser options which `etree.iterparse` accepts (unlike
+# `XMLParser`, it has no `ns_clean`, `target` or `base_url`)
+ITERPARSE_OPTIONS = frozenset([
+    'attribute_defaults', 'dtd_validation', 'load_dtd', 'no_network',
+    'remove_blank_text', 'compact', 'resolve_entities', 'remove_comments',
+    'remove_pis', 'strip_cdata', 'encoding', 'html', 'recover', 'huge_tree',
+    'schema', 'collect_ids'])
+
+
+def _options_key(options):
+    return tuple(sorted(options.items()))
+
+
+def configure(**options):
+    """Sets the default parser options used by all models."""
+    _default_options.clear()
+    _default_options.update(options)
+
+
+def default_options():
+    return dict(_default_options)
+
+
+def parser_options(options=None):
+    """Merges the given options over the default parser options."""
+    merged = dict(_default_options)
+    if options:
+        merged.update(options)
+
+    return merged
+
+
+def iterparse_options(options=None):
+    """Like `parser_options`, but only keeps options for `iterparse`.
+
+    Defaults meant for `XMLParser` which `etree.iterparse` doesn't
+    support are left out, rather than making it raise a `TypeError`.
+    """
+    return dict((name, val) for name, val in parser_options(options).items()
+                if name in ITERPARSE_OPTIONS)
+
+
+def get_parser(options=None):
+    """Gets this thread's parser for the given options.
+
+    Parsers are created once per thread for each distinct set of options
+    (merged over the defaults set with `configure`), and then reused.
+    The returned parser must not be shared with other threads.
+    """
+    options = parser_options(options)
+    key = _options_key(options)
+
+    try:
+        parsers = _local.parsers
+    except AttributeError:
+        parsers = _local.parsers = {}
+
+    parser = parsers.get(key, None)
+    if parser is None:
+        parser = parsers[key] = etree.XMLParser(**options)
+
+    return parser
+
+
+def clear():
+    """Drops this thread's cached parsers."""
+    _local.parsers = {}
@@ -2,6 +2,42 @@ def _parse_slice(ind):
     return "{attr}='{val}'".format(attr=ind.start, val=ind.stop)
 
 
+# paths are immutable, so the paths built by joining the same parent
+# path and step are only ever built once, and shared
+_tag_paths = {}
+_attr_paths = {}
+
+
+def _tag_path(parent_path, name):
+    key = (parent_path, name)
+    res = _tag_paths.get(key, None)
+    if res is None:
+        if parent_path is None:
+            res = name
+        elif parent_path[-1] == '/':
+            res = parent_path + name
+        else:
+            res = parent_path + '/' + name
+
+        _tag_paths[key] = res
+
+    return res
+
+
+def _attr_path(parent_path, attribute):
+    key = (parent_path, attribute)
+    res = _attr_paths.get(key, None)
+    if res is None:
+        if parent_path is None:
+            res = '*[@' + attribute + ']'
+        else:
+            res = parent_path + '[@' + attribute + ']'
+
+        _attr_paths[key] = res
+
+    return res
+
+
 class PathElem(object):
     def __getitem__(self, ind):
         if isinstance(ind, tuple):
@@ -43,15 +79,7 @@ class TagPathElemBase(object):
     def __init__(self, parent_path, name):
         self._parent_path = parent_path
         self._name = name
-
-    @property
-    def _path(self):
-        if self._parent_path is None:
-            return self._name
-        elif self._parent_path[-1] == '/':
-            return self._parent_path + self._name
-        else:
-            return self._parent_path + '/' + self._name
+        self._path = _tag_path(parent_path, name)
 
     def __str__(self):
         return self._path
@@ -73,13 +101,7 @@ class AttrSelectorPathElemBase(object):
     def __init__(self, tag_path, attribute):
         self._tag_path = tag_path
         self._attribute = attribute
-
-    @property
-    def _path(self):
-        if self._tag_path is None:
-            return '*[@' + self._attribute + ']'
-        else:
-            return self._tag_path + '[@' + self._attribute + ']'
+        self._path = _attr_path(tag_path, attribute)
 
     def __radd__(self, previous):
         return AttrSelectorPathElem(previous._path, self._attribute)
@@ -1,5 +1,4 @@
 import collections
-import copy
 
 from xmlmapper import core_modeler as core
 from xmlmapper.core_modeler import Model
@@ -30,7 +29,7 @@ class DescPathElem(object):
             return res
 
     def __mod__(self, mod_spec):
-        new_obj = copy.copy(self)
+        new_obj = self.__copy__()
         if isinstance(mod_spec, type):
             if issubclass(mod_spec, Model):
                 return self._with_model(new_obj, mod_spec)
@@ -155,13 +154,16 @@ class NodeValueListPathElem(DescPathElem, core.NodeValueList):
 
     def _set_options(self, new_obj, loads=None, dumps=None,
                      elem_loads=None, elem_dumps=None,
-                     always_present=None):
+                     always_present=None, bulk_dumps=None):
         loads = loads or elem_loads or self._elem_loads
         dumps = dumps or elem_dumps or self._raw_dumps
 
         if always_present is not None:
             new_obj._always_present = always_present
 
+        if bulk_dumps is not None:
+            new_obj._bulk_dumps = bulk_dumps
+
         return self._with_loads_dumps(new_obj, loads, dumps)
 
     def __getattr__(self, name):
@@ -176,6 +178,7 @@ class NodeValueListPathElem(DescPathElem, core.NodeValueList):
         new_obj._elem_loads = self._elem_loads
         new_obj._elem_dumps = self._elem_dumps
         new_obj._always_present = self._always_present
+        new_obj._bulk_dumps = self._bulk_dumps
 
         return new_obj
 
@@ -203,7 +206,8 @@ class NodeValueListViewTagPathElem(DescPathElem, core.NodeValueListView):
 
     def _set_options(self, new_obj, loads=None, dumps=None,
                      elem_loads=None, elem_dumps=None,
-                     full_replace=None, always_present=None):
+                     full_replace=None, always_present=None,
+                     bulk_dumps=None):
         loads = loads or elem_loads or self._elem_loads
         dumps = dumps or elem_dumps or self._raw_dumps
 
@@ -213,6 +217,9 @@ class NodeValueListViewTagPathElem(DescPathElem, core.NodeValueListView):
         if always_present is not None:
             new_obj._always_present = always_present
 
+        if bulk_dumps is not None:
+            new_obj._bulk_dumps = bulk_dumps
+
         return self._with_loads_dumps(new_obj, loads, dumps)
 
     def __getitem__(self, ind):
@@ -243,6 +250,7 @@ class NodeValueListViewTagPathElem(DescPathElem, core.NodeValueListView):
         new_obj._raw_dumps = self._raw_dumps
         new_obj._full_replace = self._full_replace
         new_obj._always_present = self._always_present
+        new_obj._bulk_dumps = self._bulk_dumps
 
         return new_obj
 
@@ -258,6 +266,7 @@ class NodeValueListViewAttributePathElem(NodeValueListViewTagPathElem):
         new_obj._raw_dumps = self._raw_dumps
         new_obj._full_replace = self._full_replace
         new_obj._always_present = self._always_present
+        new_obj._bulk_dumps = self._bulk_dumps
 
         return new_obj
 
@@ -265,7 +274,7 @@ class NodeValueListViewAttributePathElem(NodeValueListViewTagPathElem):
 class ModelNodeValuePathElem(core.ModelNodeValue):
     def __mod__(self, mod_spec):
         if isinstance(mod_spec, collections.Mapping):
-            new_obj = copy.copy(self)
+            new_obj = self.__copy__()
             return self._set_options(new_obj, **mod_spec)
         else:
             raise ValueError('Cannot format a ModelNodeValuePathElem '
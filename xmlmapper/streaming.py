@@ -0,0 +1,87 @@
+from lxml import etree
+
+
+class ModelWriter(object):
+    def __init__(self, output, root_tag, attrib=None, nsmap=None,
+                 encoding='utf-8', xml_declaration=True,
+                 pretty_print=False, flush_every=None):
+        self._output = output
+        self._root_tag = root_tag
+        self._attrib = attrib
+        self._nsmap = nsmap
+        self._encoding = encoding
+        self._xml_declaration = xml_declaration
+        self._pretty_print = pretty_print
+        self._flush_every = flush_every
+
+        self._xmlfile = None
+        self._writer = None
+        self._root = None
+        self._pending = 0
+        self.count = 0
+
+    @property
+    def closed(self):
+        return self._writer is None
+
+    def open(self):
+        if self._writer is not None:
+            raise ValueError('This writer is already open')
+
+        self._xmlfile = etree.xmlfile(self._output, encoding=self._encoding)
+        self._writer = self._xmlfile.__enter__()
+
+        if self._xml_declaration:
+            self._writer.write_declaration()
+
+        self._root = self._writer.element(self._root_tag, self._attrib,
+                                          self._nsmap)
+        self._root.__enter__()
+
+        return self
+
+    def write(self, model):
+        if self._writer is None:
+            raise ValueError('Cannot write to a closed writer')
+
+        self._writer.write(model._etree, with_tail=False,
+                           pretty_print=self._pretty_print)
+        self.count += 1
+        self._pending += 1
+
+        if self._flush_every and self._pending >= self._flush_every:
+            self.flush()
+
+    def write_all(self, models):
+        for model in models:
+            self.write(model)
+
+    def flush(self):
+        if self._writer is None:
+            raise ValueError('Cannot flush a closed writer')
+
+        self._writer.flush()
+        self._pending = 0
+
+    def close(self, exc_info=(None, None, None)):
+        if self._writer is None:
+            return
+
+        try:
+            self._root.__exit__(*exc_info)
+        finally:
+            self._xmlfile.__exit__(*exc_info)
+            self._xmlfile = self._writer = self._root = None
+            self._pending = 0
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close((exc_type, exc_val, exc_tb))
+
+    def __repr__(self):
+        return ("<ModelWriter({root}) records={count} "
+                "closed={closed}>").format(root=self._root_tag,
+                                           count=self.count,
+                                           closed=self.closed)
@@ -0,0 +1,178 @@
+import unittest
+
+from lxml import etree
+import should_be.all  # noqa
+
+import xmlmapper as mp
+from xmlmapper import parsers
+
+try:
+    import asyncio
+    from xmlmapper import aio
+except (ImportError, SyntaxError):  # Python 2
+    asyncio = aio = None
+
+
+class SampleModel(mp.Model):
+    ROOT_ELEM = 'some_elem'
+
+    name = mp.NodeValue('name')
+
+
+class FeedModel(mp.Model):
+    ROOT_ELEM = 'feed'
+
+    first = mp.NodeValue('some_elem/name')
+
+
+class ChunkedStream(object):
+    """An in-process stand-in for a network stream.
+
+    The data arrives in fixed-size chunks (regardless of the size asked
+    for), with a trip through the event loop for each one.
+    """
+
+    def __init__(self, data, size):
+        self.chunks = [data[ind:ind + size]
+                       for ind in range(0, len(data), size)]
+        self.reads = 0
+
+    def read(self, size=-1):
+        self.reads += 1
+        chunk = self.chunks.pop(0) if self.chunks else b''
+        return asyncio.sleep(0, result=chunk)
+
+
+class BrokenStream(ChunkedStream):
+    def read(self, size=-1):
+        if self.reads:
+            raise IOError('connection reset')
+
+        return super(BrokenStream, self).read(size)
+
+
+class ChunkIterable(object):
+    """A stand-in for streams which are async iterables of chunks."""
+
+    def __init__(self, data, size):
+        self.chunks = ChunkedStream(data, size).chunks
+
+    def __aiter__(self):
+        return self
+
+    def __anext__(self):
+        res = asyncio.get_event_loop().create_future()
+        if self.chunks:
+            res.set_result(self.chunks.pop(0))
+        else:
+            res.set_exception(StopAsyncIteration())
+
+        return res
+
+
+@unittest.skipIf(aio is None, 'asyncio support requires Python 3.6+')
+class TestAsyncParsing(unittest.TestCase):
+    def setUp(self):
+        records = b"".join(b"<some_elem><name>%d</name></some_elem>" % ind
+                           for ind in range(50))
+        self.xml = b"<feed>" + records + b"</feed>"
+
+        self.loop = asyncio.new_event_loop()
+        self.addCleanup(self.loop.close)
+
+    def run_coro(self, coro):
+        return self.loop.run_until_complete(coro)
+
+    def records(self, records, process=lambda rec: rec, limit=None):
+        # records are only valid until the next one is requested
+        res = []
+        try:
+            while limit is None or len(res) < limit:
+                res.append(process(self.run_coro(records.__anext__())))
+        except StopAsyncIteration:
+            pass
+
+        return res
+
+    def names(self, records):
+        return self.records(records, lambda rec: rec.name)
+
+    def test_from_async_stream(self):
+        stream = ChunkedStream(self.xml, 7)
+        model = self.run_coro(FeedModel.from_async_stream(stream))
+        model.first.should_be('0')
+        len(model._etree).should_be(50)
+
+    def test_from_async_stream_projected(self):
+        stream = ChunkedStream(self.xml, 100)
+        model = self.run_coro(FeedModel.from_async_stream(
+            stream, project=True, chunk_size=16))
+        model.first.should_be('0')
+
+    def test_from_stream_reader(self):
+        reader = asyncio.StreamReader(loop=self.loop)
+        reader.feed_data(self.xml)
+        reader.feed_eof()
+
+        model = self.run_coro(FeedModel.from_async_stream(reader))
+        len(model._etree).should_be(50)
+
+    def test_from_async_iterable(self):
+        model = self.run_coro(FeedModel.from_async_stream(
+            ChunkIterable(self.xml, 5), read_ahead=0))
+        len(model._etree).should_be(50)
+
+    def test_checks_root_elem(self):
+        coro = SampleModel.from_async_stream(ChunkedStream(self.xml, 10))
+        self.run_coro.should_raise(ValueError, coro)
+
+    def test_aiterparse(self):
+        records = SampleModel.aiterparse(ChunkedStream(self.xml, 3))
+        self.names(records).should_be([str(ind) for ind in range(50)])
+
+    def test_aiterparse_parser_options(self):
+        defaults = parsers.default_options()
+        self.addCleanup(lambda: parsers.configure(**defaults))
+        parsers.configure(ns_clean=True, remove_comments=True)
+
+        xml = self.xml.replace(b'<name>', b'<!-- hi --><name>')
+        records = SampleModel.aiterparse(ChunkedStream(xml, 3))
+        self.records(records, lambda rec: len(rec._etree)).should_be(
+            [1] * 50)
+
+    def test_aiterparse_clears_records(self):
+        records = SampleModel.aiterparse(ChunkedStream(self.xml, 3))
+        seen = [rec._etree for rec in self.records(records)]
+        seen[0].find('name').should_be_none()
+        seen[0].getparent().should_be_none()
+
+    def test_aiterparse_tag(self):
+        records = FeedModel.aiterparse(ChunkedStream(self.xml, 64),
+                                       tag='feed')
+        self.records(records, lambda rec: rec.first).should_be(['0'])
+
+    def test_aiterparse_where(self):
+        records = SampleModel.aiterparse(
+            ChunkedStream(self.xml, 16),
+            where={'name': lambda name: int(name) % 10 == 0})
+        self.names(records).should_be(['0', '10', '20', '30', '40'])
+
+    def test_backpressure(self):
+        stream = ChunkedStream(self.xml, 10)
+        records = SampleModel.aiterparse(stream, read_ahead=2)
+        self.addCleanup(self.run_coro, records.aclose())
+        self.records(records, limit=1)
+
+        # the first record spans a few chunks, plus those read ahead
+        self.run_coro(asyncio.sleep(0.01))
+        (stream.reads <= 8).should_be_true()
+        stream.chunks.shouldnt_be_empty()
+
+    def test_stream_errors(self):
+        records = SampleModel.aiterparse(BrokenStream(self.xml, 10))
+        self.names.should_raise(IOError, records)
+
+    def test_parse_errors(self):
+        records = SampleModel.aiterparse(
+            ChunkedStream(b"<feed><some_elem></feed>", 10))
+        self.records.should_raise(etree.XMLSyntaxError, records)
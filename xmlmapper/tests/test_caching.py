@@ -0,0 +1,77 @@
+import unittest
+
+import should_be.all  # noqa
+
+import xmlmapper as mp
+from xmlmapper import caching
+from xmlmapper import core_modeler
+
+
+class SampleModel(mp.Model):
+    ROOT_ELEM = 'some_elem'
+
+    name = mp.NodeValue('name')
+    lang = mp.AttributeValue('name', 'lang')
+
+
+class SlotSampleModel(SampleModel):
+    SLOT_STORAGE = True
+    __slots__ = ()
+
+
+class TestCacheLimit(unittest.TestCase):
+    xml = "<some_elem><name lang='en'>hi</name></some_elem>"
+    model_cls = SampleModel
+
+    def setUp(self):
+        caching.set_limit(3)
+        self.addCleanup(caching.set_limit, None)
+        self.addCleanup(caching.clear)
+
+    def cached(self, model, field):
+        desc = type(model)._descriptors[field]
+        return desc._cached_value(model) is not core_modeler._UNCACHED
+
+    def test_limit(self):
+        caching.limit().should_be(3)
+
+    def test_evicts_least_recently_used(self):
+        first = self.model_cls(self.xml, cache=True)
+        second = self.model_cls(self.xml, cache=True)
+
+        first.name.should_be('hi')
+        first.lang.should_be('en')
+        second.name.should_be('hi')
+        first.name.should_be('hi')
+
+        second.lang.should_be('en')
+        caching.size().should_be(3)
+
+        self.cached(first, 'name').should_be_true()
+        self.cached(first, 'lang').should_be_false()
+        self.cached(second, 'name').should_be_true()
+        self.cached(second, 'lang').should_be_true()
+
+    def test_evicted_values_are_reloaded(self):
+        model = self.model_cls(self.xml, cache=True)
+        model.name.should_be('hi')
+
+        caching.set_limit(0)
+        self.cached(model, 'name').should_be_false()
+        model.name.should_be('hi')
+
+    def test_uncached_values_are_forgotten(self):
+        model = self.model_cls(self.xml, cache=True)
+        model.lang.should_be('en')
+        del model.lang
+        caching.size().should_be(0)
+
+    def test_unbounded(self):
+        caching.set_limit(None)
+        model = self.model_cls(self.xml, cache=True)
+        model.name.should_be('hi')
+        caching.size().should_be(0)
+
+
+class TestSlotCacheLimit(TestCacheLimit):
+    model_cls = SlotSampleModel
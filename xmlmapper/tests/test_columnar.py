@@ -0,0 +1,127 @@
+import six
+
+if six.PY2:
+    import mock
+else:
+    from unittest import mock
+
+import array
+import math
+import unittest
+
+from lxml import etree
+import should_be.all  # noqa
+
+import xmlmapper as mp
+from xmlmapper import columnar
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class ReadingModel(mp.Model):
+    ROOT_ELEM = 'reading'
+
+    sensor = mp.AttributeValue('.', 'sensor')
+    count = mp.AttributeValue('.', 'count', loads=int)
+    value = mp.NodeValue('data/value', loads=float)
+    unit = mp.NodeValue('data/unit')
+    extra = mp.ModelNodeValue('extra', mp.Model, always_present=False)
+
+
+class _TestColumnsBase(object):
+    def setUp(self):
+        self.feed = etree.fromstring(
+            "<readings>"
+            "<reading sensor='a' count='1'><data><value>1.5</value>"
+            "<unit>C</unit></data></reading>"
+            "<reading sensor='b' count='2'><data><value>-2</value>"
+            "</data></reading>"
+            "<reading sensor='c' count='3'/>"
+            "</readings>")
+
+    def test_extracts_all_fields_in_order(self):
+        res = mp.columns(ReadingModel, self.feed,
+                         fields=['sensor', 'count', 'value', 'unit'])
+        list(res).should_be(['sensor', 'count', 'value', 'unit'])
+
+    def test_int_column(self):
+        res = mp.columns(ReadingModel, self.feed, fields=['count'])
+        list(res['count']).should_be([1, 2, 3])
+
+    def test_float_column_missing_is_nan(self):
+        values = list(mp.columns(ReadingModel, self.feed,
+                                 fields=['value'])['value'])
+        values[:2].should_be([1.5, -2.0])
+        math.isnan(values[2]).should_be_true()
+
+    def test_object_column(self):
+        res = mp.columns(ReadingModel, self.feed, fields=['sensor', 'unit'])
+        list(res['sensor']).should_be(['a', 'b', 'c'])
+        list(res['unit']).should_be(['C', None, None])
+
+    def test_missing_value(self):
+        res = mp.columns(ReadingModel, self.feed, fields=['value', 'unit'],
+                         missing=0)
+        list(res['value']).should_be([1.5, -2.0, 0.0])
+        list(res['unit']).should_be(['C', 0, 0])
+
+    def test_missing_int_requires_missing_value(self):
+        del self.feed[0].attrib['count']
+        mp.columns.should_raise(ValueError, ReadingModel, self.feed,
+                                fields=['count'])
+
+    def test_kind_override(self):
+        res = mp.columns(ReadingModel, self.feed, fields=['count'],
+                         kinds={'count': 'float'})
+        list(res['count']).should_be([1.0, 2.0, 3.0])
+
+    def test_accepts_models(self):
+        models = [ReadingModel(elem) for elem in self.feed]
+        list(mp.columns(ReadingModel, models,
+                        fields=['sensor'])['sensor']).should_be(
+            ['a', 'b', 'c'])
+
+    def test_does_not_call_numeric_loads(self):
+        desc = ReadingModel._descriptors['count']
+        with mock.patch.object(desc, '_loads', wraps=int) as loads:
+            mp.columns(ReadingModel, self.feed, fields=['count'],
+                       kinds={'count': 'int'})
+            loads.call_count.should_be(0)
+
+    def test_rejects_unsupported_fields(self):
+        mp.columns.should_raise(TypeError, ReadingModel, self.feed,
+                                fields=['extra'])
+        mp.columns.should_raise(ValueError, ReadingModel, self.feed,
+                                fields=['nope'])
+
+    def test_checks_root_elem(self):
+        mp.columns.should_raise(ValueError, ReadingModel, [self.feed],
+                                fields=['sensor'])
+
+
+@unittest.skipIf(numpy is None, 'NumPy is not installed')
+class TestColumnsNumPy(_TestColumnsBase, unittest.TestCase):
+    def test_array_types(self):
+        res = mp.columns(ReadingModel, self.feed,
+                         fields=['count', 'value', 'sensor'])
+        res['count'].dtype.should_be(numpy.int64)
+        res['value'].dtype.should_be(numpy.float64)
+        res['sensor'].dtype.should_be(object)
+
+
+class TestColumnsFallback(_TestColumnsBase, unittest.TestCase):
+    def setUp(self):
+        super(TestColumnsFallback, self).setUp()
+        patcher = mock.patch.object(columnar, 'numpy', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_array_types(self):
+        res = mp.columns(ReadingModel, self.feed,
+                         fields=['count', 'value', 'sensor'])
+        isinstance(res['count'], array.array).should_be_true()
+        res['value'].typecode.should_be('d')
+        res['sensor'].should_be(['a', 'b', 'c'])
@@ -5,12 +5,22 @@ if six.PY2:
 else:
     from unittest import mock
 
+import copy
+import gc
+import io
+import mmap
+import os
+import shutil
+import tempfile
+import threading
 import unittest
+import weakref
 
 from lxml import etree
 import should_be.all  # noqa
 
 import xmlmapper as mp
+from xmlmapper import locking
 from xmlmapper import xml_helpers as xh
 
 
@@ -181,6 +191,1392 @@ class TestElemUtils(unittest.TestCase):
         res.tag.should_be('tag2')
         t1.find('tag2').shouldnt_be_none()
 
+    def test_make_path_attrib_value_with_slash(self):
+        root = etree.Element('root')
+
+        res = mp.make_path('tag1[@href="a/b"]/tag2', root)
+
+        res.tag.should_be('tag2')
+        res.getparent().get('href').should_be('a/b')
+        mp.make_path('tag1[@href="a/b"]/tag2', root).should_be(res)
+
+    def test_make_path_namespaced(self):
+        root = etree.Element('root')
+
+        res = mp.make_path('{http://ns/x}tag1/tag2[@flag]', root)
+
+        res.getparent().tag.should_be('{http://ns/x}tag1')
+        res.get('flag').should_be('')
+
+    def test_make_path_uses_first_deepest_match(self):
+        root = etree.fromstring('<root><tag1/><tag1><tag2/></tag1></root>')
+
+        res = mp.make_path('tag1/tag2/tag3', root)
+
+        res.getparent().should_be(root[1][0])
+        root[0].should_have_length(0)
+
+    def test_make_path_unparseable_falls_back(self):
+        root = etree.fromstring('<root><tag1/></root>')
+
+        res = mp.make_path('tag1/tag2[@a=b]', root)
+
+        res.getparent().should_be(root[0])
+        res.get('a').should_be('b')
+
+    def test_make_path_wildcard(self):
+        root = etree.fromstring('<root><tag1/></root>')
+
+        mp.make_path('*/tag2', root).getparent().should_be(root[0])
+        mp.make_path.should_raise(ValueError, '*', etree.Element('root'))
+
+    def test_parse_path_is_cached(self):
+        mp.parse_path('a/b[@c="d/e"]').steps.should_be(
+            [('a', ()), ('b', (('c', 'd/e'),))])
+        mp.parse_path('a/b').should_be(mp.parse_path('a/b'))
+        mp.parse_path('a/../b').steps.should_be_none()
+
+    def test_descriptor_attrib_value_with_slash(self):
+        class LinkModel(mp.Model):
+            ROOT_ELEM = 'links'
+
+            home = mp.NodeValue('link[@href="/home"]')
+            other = mp.CustomNodeValue('link[@href="/other"]',
+                                       xh.load_text, xh.dump_text)
+
+        model = LinkModel()
+        model.home = 'Home'
+        model.other = 'Other'
+
+        str(model).should_be('<links><link href="/home">Home</link>'
+                             '<link href="/other">Other</link></links>')
+
+
+class TestModelConstructors(unittest.TestCase):
+    def setUp(self):
+        self.xml = b"<some_elem><name>hi</name></some_elem>"
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.path = os.path.join(self.tmpdir, 'model.xml')
+        with open(self.path, 'wb') as xml_file:
+            xml_file.write(self.xml)
+
+    def test_from_bytes(self):
+        SampleModel.from_bytes(self.xml).name.should_be('hi')
+
+    def test_from_buffer(self):
+        model = SampleModel.from_bytes(memoryview(bytearray(self.xml)))
+        model.name.should_be('hi')
+
+    def test_from_file(self):
+        SampleModel.from_file(self.path).name.should_be('hi')
+        SampleModel.from_file(io.BytesIO(self.xml)).name.should_be('hi')
+
+    def test_from_mmap(self):
+        SampleModel.from_mmap(self.path).name.should_be('hi')
+
+        with open(self.path, 'rb') as xml_file:
+            SampleModel.from_mmap(xml_file).name.should_be('hi')
+            mapped = mmap.mmap(xml_file.fileno(), 0, access=mmap.ACCESS_READ)
+            SampleModel.from_mmap(mapped).name.should_be('hi')
+            mapped.close()
+
+    def test_raises_when_root_elem_doesnt_match(self):
+        SampleModel.from_bytes.should_raise(ValueError, b'<other/>')
+
+    def test_lazy_defers_parsing(self):
+        with mock.patch.object(mp.etree, 'fromstring',
+                               wraps=etree.fromstring) as fromstring:
+            model = SampleModel.from_bytes(self.xml, lazy=True, cache=True)
+            fromstring.called.should_be_false()
+            model._cache.should_be_true()
+
+            model.name.should_be('hi')
+            model.name.should_be('hi')
+            fromstring.call_count.should_be(1)
+
+    def test_lazy_checks_root_elem_on_access(self):
+        model = SampleModel.from_bytes(b'<other/>', lazy=True)
+        model.__getattribute__.should_raise(ValueError, 'name')
+
+    def test_lazy_from_file(self):
+        model = SampleModel.from_file(self.path, lazy=True)
+        os.remove(self.path)
+        model.__getattribute__.should_raise(IOError, 'name')
+
+
+class TestModelIterparse(unittest.TestCase):
+    def setUp(self):
+        self.xml = io.BytesIO(
+            b"<feed>"
+            b"<some_elem><name>a</name></some_elem>"
+            b"<other><some_elem><name>b</name></some_elem></other>"
+            b"<some_elem><name>c</name></some_elem>"
+            b"</feed>")
+
+    def test_yields_each_record(self):
+        names = [model.name for model in SampleModel.iterparse(self.xml)]
+        names.should_be(['a', 'b', 'c'])
+
+    def test_clears_processed_records(self):
+        seen = [model._etree for model in SampleModel.iterparse(self.xml)]
+
+        seen[0].find('name').should_be_none()
+        seen[0].getparent().should_be_none()
+        seen[-1].getparent().should_have_length(1)
+
+    def test_custom_tag(self):
+        models = SampleModel.iterparse(self.xml, tag='name')
+        next.should_raise(ValueError, models)
+
+
+class OrderModel(mp.Model):
+    ROOT_ELEM = 'order'
+
+    status = mp.AttributeValue('.', 'status')
+    kind = mp.NodeValue('kind')
+    region = mp.AttributeValue('kind', 'region')
+    total = mp.NodeValue('summary/total', loads=int)
+
+
+class TestModelIterparseWhere(unittest.TestCase):
+    def setUp(self):
+        self.xml = io.BytesIO(
+            b"<orders>"
+            b"<order status='active'><kind region='eu'>book</kind>"
+            b"<summary><total>5</total></summary></order>"
+            b"<order status='closed'><kind>book</kind>"
+            b"<summary><total>9</total></summary></order>"
+            b"<!-- some orders --><note>skipped</note>"
+            b"<order status='active'><kind>food</kind>"
+            b"<summary><total>50</total></summary></order>"
+            b"<order status='active'><summary><total>7</total></summary>"
+            b"</order>"
+            b"</orders>")
+
+    def totals(self, **where):
+        self.xml.seek(0)
+        return [model.total
+                for model in OrderModel.iterparse(self.xml, where=where)]
+
+    def test_attributes(self):
+        self.totals(status='active').should_be([5, 50, 7])
+
+    def test_children(self):
+        self.totals(kind='book').should_be([5, 9])
+        self.totals(kind='book', status='active').should_be([5])
+        self.totals(region='eu').should_be([5])
+
+    def test_missing_children(self):
+        self.totals(kind=None).should_be([7])
+
+    def test_predicates(self):
+        self.totals(total=lambda total: total > 6).should_be([9, 50, 7])
+        self.totals(kind=lambda kind: kind != 'book',
+                    status='active').should_be([50, 7])
+
+    def test_clears_skipped_records(self):
+        models = OrderModel.iterparse(self.xml, where={'status': 'closed'})
+        model = next(models)
+        model.kind.should_be('book')
+        len(model._etree.getprevious()).should_be(0)
+
+    def test_checks_cheap_conditions_first(self):
+        total = mock.Mock(return_value=True)
+        models = OrderModel.iterparse(self.xml, where={
+            'total': total, 'kind': 'food', 'status': 'active'})
+        [model.kind for model in models].should_be(['food'])
+        total.call_count.should_be(1)
+
+    def test_does_not_wrap_failing_records(self):
+        with mock.patch.object(OrderModel, '__init__',
+                               return_value=None) as init:
+            list(OrderModel.iterparse(self.xml, where={'kind': 'food'}))
+            init.call_count.should_be(1)
+
+    def test_file_names(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        path = os.path.join(tmpdir, 'orders.xml')
+        with open(path, 'wb') as xml_file:
+            xml_file.write(self.xml.getvalue())
+
+        models = OrderModel.iterparse(path, where={'status': 'closed'})
+        [model.total for model in models].should_be([9])
+
+    def test_unknown_fields(self):
+        models = OrderModel.iterparse(self.xml, where={'nope': 1})
+        next.should_raise(ValueError, models)
+
+
+class PlannedModel(mp.Model):
+    ROOT_ELEM = 'meal'
+
+    kind = mp.AttributeValue('.', 'type')
+    cheese = mp.NodeValue('appetizers/cheese')
+    crackers = mp.AttributeValue('appetizers/cheese', 'crackers')
+    wine = mp.NodeValue('drinks/drink[@type="wine"]')
+    dessert = mp.NodeValue('dessert[1]')
+
+
+class TestAccessorPlan(unittest.TestCase):
+    def setUp(self):
+        self.xml = ("<meal type='dinner'>"
+                    "<appetizers><cheese crackers='ritz'>cheddar</cheese>"
+                    "</appetizers>"
+                    "<drinks><drink type='soda'>cola</drink>"
+                    "<drink type='wine'>merlot</drink></drinks>"
+                    "<dessert>cake</dessert>"
+                    "</meal>")
+
+    def test_split_path(self):
+        mp.split_path('a/b[@c="d/e"]/{http://ns/x}f').should_be(
+            ['a', 'b[@c="d/e"]', '{http://ns/x}f'])
+
+    def test_collects_descriptors(self):
+        list(PlannedModel._descriptors).should_be(
+            ['kind', 'cheese', 'crackers', 'wine', 'dessert'])
+
+    def patch_finds(self, model_cls):
+        finders = {}
+        for name, desc in model_cls._descriptors.items():
+            compiled = desc._compiled_path
+            finder = mock.patch.object(compiled, 'find', wraps=compiled.find)
+            finders[name] = finder.start()
+            self.addCleanup(finder.stop)
+
+        return finders
+
+    def test_plan_skips_unsupported_paths(self):
+        plan = mp.AccessorPlan(PlannedModel._descriptors.values())
+        plan.descriptors.should_have_length(4)
+
+    def test_resolves_all_nodes_in_one_walk(self):
+        plan = mp.AccessorPlan(PlannedModel._descriptors.values())
+        finders = self.patch_finds(PlannedModel)
+
+        found = plan.resolve(etree.fromstring(self.xml))
+        tags = dict((desc._node_path, node.tag)
+                    for desc, node in found.items())
+        tags.should_be({'.': 'meal', 'appetizers/cheese': 'cheese',
+                        'drinks/drink[@type="wine"]': 'drink'})
+        sum(finder.call_count for finder in finders.values()).should_be(0)
+
+    def test_model_looks_up_nodes_lazily(self):
+        model = PlannedModel(self.xml)
+        finders = self.patch_finds(PlannedModel)
+
+        model.cheese.should_be('cheddar')
+        model.cheese.should_be('cheddar')
+        finders['cheese'].call_count.should_be(1)
+        finders['wine'].call_count.should_be(0)
+        finders['dessert'].call_count.should_be(0)
+
+    def test_falls_back_to_find_for_later_matches(self):
+        model = PlannedModel("<meal><appetizers/><appetizers>"
+                             "<cheese>swiss</cheese></appetizers></meal>")
+        model.cheese.should_be('swiss')
+
+    def test_overlapping_sibling_paths(self):
+        class SiblingModel(mp.Model):
+            ROOT_ELEM = 'r'
+
+            keyed = mp.NodeValue('a[@k="1"]')
+            plain = mp.NodeValue('a')
+            keyed_child = mp.NodeValue('a[@k="2"]/b')
+            any_child = mp.NodeValue('*/b')
+
+        xml = '<r><a k="1">one<c/></a><a k="2">two<b>x</b></a></r>'
+        self.check_matches_find(SiblingModel, xml)
+
+    def test_wildcard_paths(self):
+        class WildModel(mp.Model):
+            ROOT_ELEM = 'r'
+
+            a_y = mp.NodeValue('a/y')
+            any_x = mp.NodeValue('*/x')
+            any_any = mp.NodeValue('*/*')
+            b_x = mp.NodeValue('b/x')
+
+        xml = '<r><a><y>ay</y><x>ax</x></a><b><x>bx</x></b></r>'
+        self.check_matches_find(WildModel, xml)
+
+    def check_matches_find(self, model_cls, xml):
+        root = etree.fromstring(xml)
+        expected = dict((name, desc._compiled_path.find(root))
+                        for name, desc in model_cls._descriptors.items())
+
+        plan = mp.AccessorPlan(model_cls._descriptors.values())
+        found = plan.resolve(root)
+        for name, desc in model_cls._descriptors.items():
+            if desc in found:
+                found[desc].should_be(expected[name])
+
+        model = model_cls(root)
+        for name, node in expected.items():
+            getattr(model, name).should_be(node.text)
+
+        model_cls(root).to_dict().should_be(
+            dict((name, node.text) for name, node in expected.items()))
+
+    def test_descriptors_added_after_creation(self):
+        class LateModel(mp.Model):
+            ROOT_ELEM = 'meal'
+
+        class LateSubModel(LateModel):
+            pass
+
+        LateModel.cheese = mp.NodeValue('appetizers/cheese')
+        list(LateSubModel._descriptors).should_be(['cheese'])
+        LateSubModel(self.xml).cheese.should_be('cheddar')
+
+        del LateModel.cheese
+        LateSubModel._descriptors.should_be_empty()
+
+
+class CourseModel(mp.Model):
+    ROOT_ELEM = 'course'
+
+    name = mp.AttributeValue('.', 'name')
+
+
+class MenuModel(mp.Model):
+    ROOT_ELEM = 'menu'
+
+    title = mp.NodeValue('title')
+    main = mp.ModelNodeValue('course', CourseModel, always_present=False)
+    courses = mp.NodeValueList('courses', CourseModel, lambda m: m._etree)
+
+
+class TestBulkLoad(unittest.TestCase):
+    def setUp(self):
+        self.xml = ("<meal type='dinner'>"
+                    "<appetizers><cheese crackers='ritz'>cheddar</cheese>"
+                    "</appetizers>"
+                    "<drinks><drink type='wine'>merlot</drink></drinks>"
+                    "<dessert>cake</dessert>"
+                    "</meal>")
+
+    def test_field_names(self):
+        PlannedModel.field_names().should_be(
+            ['kind', 'cheese', 'crackers', 'wine', 'dessert'])
+
+    def test_to_dict(self):
+        PlannedModel(self.xml).to_dict().should_be({
+            'kind': 'dinner', 'cheese': 'cheddar', 'crackers': 'ritz',
+            'wine': 'merlot', 'dessert': 'cake'})
+
+    def test_to_dict_missing_nodes(self):
+        model = PlannedModel()
+        model.to_dict().should_be(dict.fromkeys(PlannedModel.field_names()))
+        model._etree.should_have_length(0)
+
+    def test_to_dict_skips_storage(self):
+        model = SlotModel("<some_elem><name lang='en'>val</name>"
+                          "</some_elem>", cache=True)
+        model.to_dict().should_be({'name': 'val', 'lang': 'en'})
+        model._node_slots.should_be([None] * len(model._node_slots))
+
+    def test_to_dict_sees_modifications(self):
+        model = PlannedModel(self.xml)
+        model.cheese = 'brie'
+        model.to_dict()['cheese'].should_be('brie')
+
+    def test_to_dict_recursive(self):
+        menu = MenuModel("<menu><title>Lunch</title>"
+                         "<course name='soup'/>"
+                         "<courses><course name='salad'/>"
+                         "<course name='pie'/></courses></menu>")
+
+        shallow = menu.to_dict()
+        isinstance(shallow['main'], CourseModel).should_be_true()
+        shallow['courses'][1].name.should_be('pie')
+
+        menu.to_dict(recursive=True).should_be({
+            'title': 'Lunch',
+            'main': {'name': 'soup'},
+            'courses': [{'name': 'salad'}, {'name': 'pie'}]})
+
+    def test_load_many(self):
+        root = etree.fromstring("<meals>{0}{0}</meals>".format(self.xml))
+        res = PlannedModel.load_many(root)
+        res.should_have_length(2)
+        res[1]['wine'].should_be('merlot')
+
+    def test_load_many_as_tuples(self):
+        models = [PlannedModel(self.xml), PlannedModel()]
+        PlannedModel.load_many(models, as_tuples=True).should_be([
+            ('dinner', 'cheddar', 'ritz', 'merlot', 'cake'),
+            (None, None, None, None, None)])
+
+    def test_load_many_iterparse(self):
+        source = io.BytesIO(
+            "<meals>{0}{0}</meals>".format(self.xml).encode('utf-8'))
+        res = PlannedModel.load_many(PlannedModel.iterparse(source))
+        [rec['cheese'] for rec in res].should_be(['cheddar', 'cheddar'])
+
+    def test_load_many_checks_root_elem(self):
+        root = etree.fromstring("<meals><lunch/></meals>")
+        PlannedModel.load_many.should_raise(ValueError, root)
+
+
+class TestBulkBuild(unittest.TestCase):
+    def setUp(self):
+        self.row = {'kind': 'dinner', 'cheese': 'cheddar',
+                    'crackers': 'ritz', 'wine': 'merlot'}
+
+    def test_from_dict_matches_assignment(self):
+        model = PlannedModel.from_dict(self.row)
+
+        expected = PlannedModel()
+        expected.kind = 'dinner'
+        expected.cheese = 'cheddar'
+        expected.crackers = 'ritz'
+        expected.wine = 'merlot'
+
+        str(model).should_be(str(expected))
+        model.to_dict().should_be(dict(self.row, dessert=None))
+
+    def test_from_dict_skips_none(self):
+        model = PlannedModel.from_dict({'cheese': 'brie', 'wine': None})
+        model._etree.find('drinks').should_be_none()
+        model.cheese.should_be('brie')
+
+    def test_from_dict_unknown_field(self):
+        PlannedModel.from_dict.should_raise(ValueError, {'beer': 'ale'})
+
+    def test_from_dict_cache(self):
+        PlannedModel.from_dict(self.row, cache=True)._cache.should_be_true()
+
+    def test_from_dict_models_and_lists(self):
+        sub = CourseModel()
+        sub.name = 'soup'
+        menu = MenuModel.from_dict({
+            'title': 'Lunch', 'main': sub,
+            'courses': [CourseModel.from_dict({'name': 'pie'})]})
+
+        menu.to_dict(recursive=True).should_be({
+            'title': 'Lunch', 'main': {'name': 'soup'},
+            'courses': [{'name': 'pie'}]})
+        menu.main._etree.should_be(sub._etree)
+
+    def test_from_dict_nested_dicts(self):
+        menu = MenuModel.from_dict({'main': {'name': 'soup'}})
+        menu.main.name.should_be('soup')
+
+    def test_from_dict_custom_node(self):
+        class CustomModel(mp.Model):
+            ROOT_ELEM = 'some_elem'
+
+            val = mp.CustomNodeValue('a/b[@c="d"]', xh.load_text,
+                                     xh.dump_text)
+
+        model = CustomModel.from_dict({'val': 'hi'})
+        model._etree.find('a/b').get('c').should_be('d')
+        model.val.should_be('hi')
+
+    def test_build_many_reuses_templates(self):
+        class BuildModel(PlannedModel):
+            pass
+
+        models = BuildModel.build_many([self.row, self.row,
+                                        {'cheese': 'brie'}])
+        [model.cheese for model in models].should_be(
+            ['cheddar', 'cheddar', 'brie'])
+        (models[0]._etree is models[1]._etree).should_be_false()
+        BuildModel._templates.should_have_length(2)
+
+    def test_templates_reset_when_fields_change(self):
+        class BuildModel(PlannedModel):
+            pass
+
+        BuildModel.from_dict({'cheese': 'brie'})
+        BuildModel.cheese = mp.NodeValue('cheese')
+        BuildModel._templates.should_be_empty()
+        str(BuildModel.from_dict({'cheese': 'brie'})).should_be(
+            '<meal><cheese>brie</cheese></meal>')
+
+
+class TestProjection(unittest.TestCase):
+    def setUp(self):
+        self.xml = (b"<meal type='dinner'>"
+                    b"<appetizers><cheese crackers='ritz'>cheddar"
+                    b"<note>aged</note> and more</cheese>"
+                    b"<olives/></appetizers>"
+                    b"<drinks><drink type='soda'>cola</drink>"
+                    b"<drink type='wine'>merlot</drink></drinks>"
+                    b"<dessert>cake<topping/></dessert>"
+                    b"<bill total='42'><line/></bill>"
+                    b"</meal>")
+
+    def test_prunes_unmapped_nodes(self):
+        model = PlannedModel.from_bytes(self.xml, project=True)
+        model.to_dict().should_be(PlannedModel.from_bytes(self.xml).to_dict())
+
+        str(model).should_be(
+            '<meal type="dinner">'
+            '<appetizers><cheese crackers="ritz">cheddar</cheese>'
+            '</appetizers>'
+            '<drinks><drink type="wine">merlot</drink></drinks>'
+            '<dessert>cake<topping/></dessert>'
+            '</meal>')
+
+    def test_projects_submodels_and_lists(self):
+        xml = (b"<menu><title>Lunch<b/></title><price>3</price>"
+               b"<course name='soup'><spoon/></course>"
+               b"<courses><course name='pie'><!-- hot --></course>"
+               b"</courses></menu>")
+        model = MenuModel.from_bytes(xml, project=True)
+
+        str(model).should_be(
+            '<menu><title>Lunch</title><course name="soup"/>'
+            '<courses><course name="pie"><!-- hot --></course></courses>'
+            '</menu>')
+        model.to_dict(recursive=True).should_be({
+            'title': 'Lunch', 'main': {'name': 'soup'},
+            'courses': [{'name': 'pie'}]})
+
+    def test_list_view_keeps_selected_items(self):
+        class ViewModel(mp.Model):
+            ROOT_ELEM = 'some_elem'
+
+            items = mp.NodeValueListView('items', 'item[@type="a"]',
+                                         xh.load_text, xh.dump_text)
+
+        model = ViewModel.from_bytes(
+            b"<some_elem><items><item type='a'>x<i/></item>"
+            b"<item type='b'>y</item><other/></items></some_elem>",
+            project=True)
+        str(model).should_be('<some_elem><items><item type="a">x<i/></item>'
+                             '</items></some_elem>')
+
+    def test_namespaces(self):
+        class NSModel(mp.Model):
+            ROOT_ELEM = '{http://ns/x}some_elem'
+
+            name = mp.NodeValue('{http://ns/y}name')
+
+        model = NSModel.from_bytes(
+            b"<some_elem xmlns='http://ns/x' xmlns:y='http://ns/y'>"
+            b"<y:name>hi</y:name><other/></some_elem>", project=True)
+        model.name.should_be('hi')
+        model._etree.should_have_length(1)
+
+    def test_unprojectable_paths_parse_everything(self):
+        class XPathModel(mp.Model):
+            ROOT_ELEM = 'meal'
+
+            drinks = mp.NodeValue('//drink[last()]', xpath=True)
+
+        XPathModel._parser(project=True).should_be(XPathModel._parser())
+        model = XPathModel.from_bytes(self.xml, project=True)
+        model.drinks.should_be('merlot')
+        model._etree.find('bill').shouldnt_be_none()
+
+    def test_from_file(self):
+        model = PlannedModel.from_file(io.BytesIO(self.xml), project=True)
+        model.wine.should_be('merlot')
+        model._etree.find('bill').should_be_none()
+
+    def test_checks_root_elem(self):
+        PlannedModel.from_bytes.should_raise(ValueError, b'<other/>',
+                                             project=True)
+
+
+class TrackedModel(PlannedModel):
+    TRACK_CHANGES = True
+
+    menu = mp.ModelNodeValue('menu', MenuModel, always_present=False)
+    specials = mp.NodeValueList(
+        'specials', xh.load_text,
+        lambda v: xh.dump_text(v, etree.Element('special')))
+
+
+def apply_patch(root, patch):
+    """Applies the subset of RFC 5261 used by `Model.patch`."""
+    root = copy.deepcopy(root)
+    tree = root.getroottree()
+    for op in patch:
+        target = tree.xpath(op.get('sel'))[0]
+        if op.tag == 'add' and op.get('type'):
+            target.set(op.get('type')[1:], op.text)
+        elif op.tag == 'add':
+            target.append(copy.deepcopy(op[0]))
+        elif op.tag == 'replace' and isinstance(target, six.string_types):
+            target.getparent().set(target.attrname, op.text)
+        elif op.tag == 'replace':
+            target.getparent().replace(target, copy.deepcopy(op[0]))
+        elif isinstance(target, six.string_types):
+            del target.getparent().attrib[target.attrname]
+        else:
+            target.getparent().remove(target)
+
+    return root
+
+
+class TestChangeTracking(unittest.TestCase):
+    def setUp(self):
+        self.xml = ("<meal type='dinner'>"
+                    "<appetizers><cheese crackers='ritz'>cheddar</cheese>"
+                    "</appetizers>"
+                    "<menu><title>Dinner</title></menu>"
+                    "<specials><special>soup</special></specials>"
+                    "</meal>")
+        self.original = etree.fromstring(self.xml)
+        self.model = TrackedModel(self.xml)
+
+    def check_patch(self, model=None, original=None):
+        model = model or self.model
+        original = original if original is not None else self.original
+        patched = apply_patch(original, model.patch())
+        etree.tostring(patched).should_be(model.to_xml())
+
+    def test_disabled_by_default(self):
+        model = PlannedModel(self.xml)
+        model.cheese = 'brie'
+        model._journal.should_be_none()
+        model.changed_fields.should_raise(ValueError)
+
+    def test_changed_fields(self):
+        self.model.changed_fields().should_be_empty()
+
+        self.model.wine = 'merlot'
+        self.model.cheese = 'brie'
+        self.model.cheese = 'gouda'
+
+        self.model.changed_fields().should_be(['wine', 'cheese'])
+
+    def test_diff(self):
+        self.model.cheese = 'brie'
+        self.model.kind = 'lunch'
+        self.model.wine = 'merlot'
+        self.model.crackers = 'ritz'
+        self.model.diff().should_be({'cheese': ('cheddar', 'brie'),
+                                     'kind': ('dinner', 'lunch'),
+                                     'wine': (None, 'merlot')})
+
+    def test_list_and_submodel_changes(self):
+        self.model.specials.append('pie')
+        self.model.menu.title = 'Supper'
+
+        self.model.changed_fields().should_be(['specials', 'menu'])
+        self.model.diff().should_be({
+            'menu': ({'title': 'Dinner', 'main': None, 'courses': None},
+                     {'title': 'Supper', 'main': None, 'courses': None}),
+            'specials': (['soup'], ['soup', 'pie'])})
+
+    def test_patch_replace_and_remove(self):
+        self.model.cheese = 'brie'
+        self.model.kind = 'lunch'
+        del self.model.crackers
+        del self.model.menu
+        self.model.specials.append('pie')
+
+        ops = [(op.tag, op.get('sel')) for op in self.model.patch()]
+        # the crackers are removed by replacing the cheese
+        ops.should_be([('replace', '/meal/appetizers/cheese'),
+                       ('replace', '/meal/@type'),
+                       ('remove', '/meal/menu'),
+                       ('replace', '/meal/specials')])
+        self.check_patch()
+
+    def test_patch_adds_missing_nodes_once(self):
+        original = etree.fromstring("<meal><menu/></meal>")
+        model = TrackedModel(copy.deepcopy(original))
+        model.specials = ['pie']
+        model.wine = 'merlot'
+        model.menu.courses = []
+
+        ops = [(op.tag, op.get('sel')) for op in model.patch()]
+        ops.should_be([('add', '/meal'), ('add', '/meal'),
+                       ('replace', '/meal/menu')])
+        self.check_patch(model, original)
+
+    def test_patch_adds_attributes(self):
+        model = TrackedModel("<meal><appetizers><cheese/></appetizers>"
+                             "</meal>")
+        model.crackers = 'ritz'
+
+        op = model.patch()[0]
+        (op.tag, op.get('sel'), op.get('type'), op.text).should_be(
+            ('add', '/meal/appetizers/cheese', '@crackers', 'ritz'))
+
+    def test_patch_skips_unchanged_values(self):
+        self.model.cheese = 'cheddar'
+        self.model.patch().should_have_length(0)
+
+    def test_clear_changes(self):
+        self.model.cheese = 'brie'
+        self.model.clear_changes()
+        self.model.changed_fields().should_be_empty()
+
+        self.model.cheese = 'gouda'
+        self.model.diff().should_be({'cheese': ('brie', 'gouda')})
+
+
+class TestCompiledPath(unittest.TestCase):
+    def setUp(self):
+        self.xml = etree.fromstring("<meal><drink n='1'/><drink n='2'>"
+                                    "<size>large</size></drink></meal>")
+
+    def test_find(self):
+        mp.compile_path('drink[@n="2"]/size').find(self.xml).text.should_be(
+            'large')
+        mp.compile_path('drink/size/none').find(self.xml).should_be_none()
+
+    def test_find_self(self):
+        mp.compile_path('.').find(self.xml).should_be_exactly(self.xml)
+
+    def test_findall(self):
+        mp.compile_path('drink').findall(self.xml).should_have_length(2)
+
+    def test_matches_elementpath(self):
+        xml = etree.fromstring("<meal xmlns:q='urn:q'><drink n='1'/>"
+                               "<snack/><drink n='2'><size>large</size>"
+                               "<size>small</size></drink><q:drink/>"
+                               "</meal>")
+        paths = ['drink', 'drink[2]', 'drink[@n="2"]', 'drink/size', '*',
+                 '*/size', './/size', 'drink//size', '{urn:q}drink', 'none',
+                 'drink/none']
+        for path in paths:
+            compiled = mp.compile_path(path)
+            compiled.find(xml).should_be(xml.find(path))
+            compiled.findall(xml).should_be(xml.findall(path))
+
+    def test_reuses_compiled_paths(self):
+        mp.compile_path('drink').should_be_exactly(mp.compile_path('drink'))
+
+    def test_namespace_wildcards(self):
+        xml = etree.fromstring("<meal xmlns:q='urn:q'><q:drink/></meal>")
+        mp.compile_path('{*}drink').find(xml).shouldnt_be_none()
+
+    def test_full_xpath(self):
+        path = mp.compile_path('drink[last()]/size[contains(., "arg")]',
+                               xpath=True)
+        path.find(self.xml).text.should_be('large')
+
+    def test_xpath_descriptors(self):
+        class DrinkModel(mp.Model):
+            ROOT_ELEM = 'meal'
+
+            last_drink = mp.AttributeValue('drink[last()]', 'n', xpath=True)
+            sizes = mp.NodeValueListView('drink[@n > 1]', 'size[. != ""]',
+                                         lambda e: e.text,
+                                         lambda v, e: e.text, xpath=True)
+
+        model = DrinkModel(self.xml)
+        plan = mp.AccessorPlan(DrinkModel._descriptors.values())
+        plan.descriptors.should_be_empty()
+        model.last_drink.should_be('2')
+        list(model.sizes).should_be(['large'])
+
+
+class SlotModel(mp.Model):
+    ROOT_ELEM = 'some_elem'
+    SLOT_STORAGE = True
+    __slots__ = ()
+
+    name = mp.NodeValue('name')
+    lang = mp.AttributeValue('name', 'lang')
+
+
+class TestSlotStorage(unittest.TestCase):
+    def setUp(self):
+        self.xml = "<some_elem><name lang='en'>hi</name></some_elem>"
+
+    def test_no_instance_dict(self):
+        model = SlotModel(self.xml)
+        model.__setattr__.should_raise(AttributeError, 'other', 1)
+
+    def test_does_not_use_descriptor_dicts(self):
+        model = SlotModel(self.xml, cache=True)
+        model.name.should_be('hi')
+        model.lang.should_be('en')
+
+        SlotModel.name._nodes.should_be_empty()
+        SlotModel.name._cached_vals.should_be_empty()
+        model._node_slots.should_have_length(2)
+        model._value_slots.should_be(['hi', 'en'])
+
+    def test_cache_enabled(self):
+        model = SlotModel(self.xml, cache=True)
+        model.name.should_be('hi')
+        model._etree.find('name').text = 'bye'
+        model.name.should_be('hi')
+
+    def test_cache_disabled(self):
+        model = SlotModel(self.xml)
+        model.name.should_be('hi')
+        model._etree.find('name').text = 'bye'
+        model.name.should_be('bye')
+
+    def test_set_and_delete(self):
+        model = SlotModel(cache=True)
+        model.name = 'hi'
+        model.name.should_be('hi')
+        model._etree.find('name').text.should_be('hi')
+
+        model.lang = 'en'
+        del model.lang
+        model.lang.should_be_none()
+
+    def test_foreign_descriptors_fall_back(self):
+        model = SlotModel(self.xml)
+        desc = mp.NodeValue('name')
+        desc.__get__(model).should_be('hi')
+        desc._nodes.shouldnt_be_empty()
+
+    def test_deepcopy(self):
+        model = SlotModel(self.xml, cache=True)
+        model.name.should_be('hi')
+
+        res = copy.deepcopy(model)
+        (res._etree is model._etree).should_be_false()
+        res._cache.should_be_true()
+        res._node_slots.should_be([None, None])
+
+        res.name = 'bye'
+        res.name.should_be('bye')
+        model.name.should_be('hi')
+
+    def test_copy_shares_tree(self):
+        model = SlotModel(self.xml)
+        res = copy.copy(model)
+        (res._etree is model._etree).should_be_true()
+        (res._node_slots is model._node_slots).should_be_false()
+
+    def test_aliased_descriptor(self):
+        class AliasModel(SlotModel):
+            __slots__ = ()
+
+            title = SlotModel.name
+            other = mp.NodeValue('other')
+
+        model = AliasModel(self.xml, cache=True)
+        model.title.should_be('hi')
+        model.other = 'there'
+        model.other.should_be('there')
+        model.name = 'bye'
+        model.title.should_be('bye')
+        model._value_slots.should_have_length(3)
+
+
+class CachedSubModel(mp.Model):
+    ROOT_ELEM = 'sub'
+
+    name = mp.NodeValue('name')
+
+
+class CachedModel(mp.Model):
+    ROOT_ELEM = 'some_elem'
+
+    sub = mp.ModelNodeValue('sub', CachedSubModel, always_present=False)
+    sub_name = mp.NodeValue('sub/name')
+    lang = mp.AttributeValue('sub/name', 'lang')
+    raw_sub = mp.CustomNodeValue('sub', xh.load_text, xh.dump_text)
+    other = mp.NodeValue('other')
+
+
+class TestCaching(unittest.TestCase):
+    def setUp(self):
+        self.xml = "<some_elem><sub><name>hi</name></sub></some_elem>"
+        self.model = CachedModel(self.xml, cache=True)
+
+    def test_caches_misses(self):
+        self.model.lang.should_be_none()
+        self.model._etree.find('sub/name').set('lang', 'en')
+        self.model.lang.should_be_none()
+
+        with mock.patch.object(CachedModel.lang, '_stored_node') as stored:
+            self.model.lang.should_be_none()
+            stored.called.should_be_false()
+
+    def test_invalidate(self):
+        self.model.lang.should_be_none()
+        self.model.sub_name.should_be('hi')
+
+        self.model._etree.find('sub/name').set('lang', 'en')
+        self.model._etree.remove(self.model._etree.find('sub'))
+        self.model._etree.append(etree.fromstring(
+            "<sub><name lang='fr'>salut</name></sub>"))
+        self.model.invalidate()
+
+        self.model.lang.should_be('fr')
+        self.model.sub_name.should_be('salut')
+
+    def test_memoizes_submodels(self):
+        sub = self.model.sub
+        self.model.sub.should_be(sub)
+        sub._cache.should_be_true()
+
+        other = CachedSubModel()
+        self.model.sub = other
+        self.model.sub.should_be(other)
+
+        del self.model.sub
+        self.model.sub.should_be_none()
+
+    def test_uncached_submodels_are_memoized(self):
+        model = CachedModel(self.xml)
+        sub = model.sub
+        model.sub.should_be(sub)
+        sub._cache.should_be_false()
+
+        model._etree.remove(model._etree.find('sub'))
+        model._etree.append(etree.fromstring("<sub><name>bye</name></sub>"))
+        model.invalidate()
+        (model.sub is sub).should_be_false()
+        model.sub.name.should_be('bye')
+
+    def test_submodel_caches_survive_access(self):
+        self.model.sub.name.should_be('hi')
+        self.model._etree.find('sub/name').text = 'bye'
+        self.model.sub.name.should_be('hi')
+
+    def test_owner_changes_invalidate_memoized_submodels(self):
+        sub = self.model.sub
+        sub.name.should_be('hi')
+
+        self.model.sub_name = 'bye'
+        (self.model.sub is sub).should_be_true()
+        sub.name.should_be('bye')
+
+        self.model.lang = 'en'
+        self.model.sub.name = 'salut'
+        self.model.sub_name.should_be('salut')
+
+    def test_modifications_invalidate_overlapping_fields(self):
+        self.model.sub_name.should_be('hi')
+        self.model.other.should_be_none()
+
+        self.model.lang = 'en'
+        self.model.other = 'thing'
+        self.model.raw_sub.should_be(None)
+        self.model.sub_name = 'bye'
+
+        self.model.sub.name.should_be('bye')
+        self.model.other.should_be('thing')
+
+    def test_submodel_modifications_invalidate_parent(self):
+        self.model.sub_name.should_be('hi')
+        self.model.sub.name = 'bye'
+        self.model.sub_name.should_be('bye')
+
+    def test_replacing_nodes_forgets_nested_nodes(self):
+        model = CachedModel(self.xml)
+        model.sub_name.should_be('hi')
+
+        new_sub = CachedSubModel()
+        new_sub.name = 'bye'
+        model.sub = new_sub
+
+        model.sub_name.should_be('bye')
+        model.lang = 'en'
+        new_sub._etree.find('name').get('lang').should_be('en')
+
+    def test_deleting_nodes_forgets_nested_nodes(self):
+        class TextModel(mp.Model):
+            ROOT_ELEM = 't'
+
+            a = mp.NodeValue('a')
+            ab = mp.NodeValue('a/b')
+
+        model = TextModel('<t><a>x<b>old</b></a></t>')
+        model.ab.should_be('old')
+
+        del model.a
+        model.ab.should_be_none()
+        model.ab = 'new'
+        model.to_xml().should_be(b'<t><a><b>new</b></a></t>')
+
+    def test_overlapping_fields(self):
+        class WildModel(mp.Model):
+            ROOT_ELEM = 'some_elem'
+
+            name = mp.NodeValue('sub/name')
+            any_name = mp.NodeValue('*/name')
+            sub = mp.CustomNodeValue('sub', xh.load_text, xh.dump_text)
+            other = mp.NodeValue('other')
+            deep = mp.NodeValue('sub//name')
+
+        descs = WildModel._descriptors
+        names = dict((desc, name) for name, desc in descs.items())
+
+        def overlaps(table, name):
+            return [names[desc] for desc in table[descs[name]]]
+
+        overlaps(WildModel._overlaps, 'name').should_be(
+            ['any_name', 'sub', 'deep'])
+        overlaps(WildModel._nested, 'name').should_be(['any_name', 'deep'])
+        overlaps(WildModel._nested, 'sub').should_be(
+            ['name', 'any_name', 'deep'])
+        overlaps(WildModel._overlaps, 'other').should_be(['any_name', 'deep'])
+        overlaps(WildModel._nested, 'deep').should_be(
+            ['name', 'any_name', 'sub', 'other'])
+
+    def test_submodel_does_not_keep_parent_alive(self):
+        model = CachedModel(self.xml, cache=True)
+        model.sub.name.should_be('hi')
+        model_ref = weakref.ref(model)
+
+        del model
+        gc.collect()
+        model_ref().should_be_none()
+
+
+class SharedModel(CachedModel):
+    THREAD_SAFE = True
+
+    menu = mp.ModelNodeValue('menu', MenuModel)
+    specials = mp.NodeValueList(
+        'specials', xh.load_text,
+        lambda v: xh.dump_text(v, etree.Element('special')),
+        always_present=True)
+
+
+class TestThreadSafety(unittest.TestCase):
+    def setUp(self):
+        self.xml = ("<some_elem><sub><name>hi</name></sub>"
+                    "<specials><special>soup</special></specials>"
+                    "</some_elem>")
+        self.model = SharedModel(self.xml)
+
+    def start(self, func, *args):
+        thread = threading.Thread(target=func, args=args)
+        thread.daemon = True
+        thread.start()
+        self.addCleanup(thread.join, 5)
+        return thread
+
+    def test_reads_leave_descriptors_alone(self):
+        self.model.sub_name.should_be('hi')
+        self.model.sub.name.should_be('hi')
+        list(self.model.specials).should_be(['soup'])
+
+        for desc in SharedModel._descriptors.values():
+            len(desc._nodes).should_be(0)
+        len(CachedSubModel.name._nodes).should_be(0)
+
+    def test_submodels_share_the_lock(self):
+        self.model.sub._lock.should_be(self.model._lock)
+        self.model.menu._lock.should_be(self.model._lock)
+
+    def test_writes_wait_for_readers(self):
+        with self.model.reading():
+            writer = self.start(setattr, self.model, 'sub_name', 'bye')
+            writer.join(0.1)
+            writer.is_alive().should_be_true()
+            self.model.sub_name.should_be('hi')
+
+        writer.join(5)
+        self.model.sub_name.should_be('bye')
+
+    def test_list_writes_wait_for_readers(self):
+        specials = self.model.specials
+        with self.model.reading():
+            writer = self.start(specials.append, 'salad')
+            writer.join(0.1)
+            writer.is_alive().should_be_true()
+
+        writer.join(5)
+        list(specials).should_be(['soup', 'salad'])
+
+    def test_concurrent_reads(self):
+        results = []
+
+        def read():
+            for _ in range(200):
+                results.append((self.model.sub.name, self.model.menu.title,
+                                list(self.model.specials)))
+
+        threads = [self.start(read) for _ in range(4)]
+        for thread in threads:
+            thread.join(5)
+
+        results.should_have_length(800)
+        set(map(repr, results)).should_be(
+            set([repr(('hi', None, ['soup']))]))
+        self.model._etree.findall('menu').should_have_length(1)
+
+    def test_writing_groups_modifications(self):
+        with self.model.writing():
+            self.model.sub_name = 'bye'
+            self.model.other = 'thing'
+
+        self.model.sub_name.should_be('bye')
+        self.model.other.should_be('thing')
+
+    def test_cannot_write_while_reading(self):
+        with self.model.reading():
+            setattr.should_raise(RuntimeError, self.model, 'other', 'x')
+
+    def test_lazy_models(self):
+        model = SharedModel.from_bytes(self.xml.encode('utf-8'), lazy=True)
+        model.sub_name.should_be('hi')
+
+    def test_lazy_models_parse_while_reading(self):
+        model = SharedModel.from_bytes(self.xml.encode('utf-8'), lazy=True)
+        with model.reading():
+            model.sub_name.should_be('hi')
+
+    def test_missing_nodes_arent_created_while_reading(self):
+        model = SharedModel(self.xml.replace('<specials><special>soup'
+                                             '</special></specials>', ''),
+                            cache=True)
+        with model.reading():
+            model.menu.should_be_none()
+            model.specials.should_be_none()
+            model._etree.find('menu').should_be_none()
+
+        model.menu.title.should_be_none()
+        list(model.specials).should_be([])
+        model._etree.find('menu').shouldnt_be_none()
+
+    def test_unshared_models_dont_lock(self):
+        model = CachedModel(self.xml)
+        model._lock.should_be_none()
+        with model.reading():
+            with model.writing():
+                model.other = 'thing'
+
+        model.other.should_be('thing')
+
+
+class TestFreeze(unittest.TestCase):
+    def setUp(self):
+        self.xml = ("<some_elem><sub><name>hi</name></sub>"
+                    "<specials><special>soup</special></specials>"
+                    "</some_elem>")
+        self.model = CachedModel(self.xml)
+        self.frozen = self.model.freeze()
+
+    def test_copies_the_tree(self):
+        self.frozen.sub_name.should_be('hi')
+        self.model.sub_name = 'bye'
+        self.frozen.sub_name.should_be('hi')
+        self.frozen._cache.should_be_true()
+
+    def test_cannot_be_modified(self):
+        setattr.should_raise(TypeError, self.frozen, 'other', 'thing')
+        delattr.should_raise(TypeError, self.frozen, 'sub_name')
+        setattr.should_raise(TypeError, self.frozen.sub, 'name', 'bye')
+        self.frozen._etree.find('other').should_be_none()
+        self.frozen.sub_name.should_be('hi')
+
+    def test_lists_cannot_be_modified(self):
+        specials = SharedModel(self.xml).freeze().specials
+        specials.append.should_raise(TypeError, 'salad')
+        specials.__delitem__.should_raise(TypeError, 0)
+        list(specials).should_be(['soup'])
+
+    def test_does_not_create_missing_nodes(self):
+        frozen = SharedModel(self.xml).freeze()
+        frozen.menu.should_be_none()
+        frozen._etree.find('menu').should_be_none()
+
+    def test_deepcopy_is_modifiable(self):
+        res = copy.deepcopy(SharedModel(self.xml).freeze())
+        res.sub_name = 'bye'
+        res.sub_name.should_be('bye')
+        (res._lock is locking.FROZEN).should_be_false()
+
+    def test_reads_leave_descriptors_alone(self):
+        self.frozen.sub_name.should_be('hi')
+        len(CachedModel.sub_name._nodes).should_be(0)
+        len(CachedModel.sub_name._cached_vals).should_be(0)
+
+
+class PrettyModel(CachedModel):
+    XML_OPTIONS = {'pretty_print': True, 'xml_declaration': True,
+                   'encoding': 'UTF-8'}
+
+
+class ItemsModel(CachedModel):
+    items = mp.NodeValueList('items', CachedSubModel, lambda m: m._etree)
+
+
+class TestSerialization(unittest.TestCase):
+    def setUp(self):
+        self.xml = "<some_elem><sub><name>hi</name></sub></some_elem>"
+
+    def test_class_options(self):
+        model = PrettyModel(self.xml)
+        model.to_xml().should_be(
+            b"<?xml version='1.0' encoding='UTF-8'?>\n"
+            b"<some_elem>\n  <sub>\n    <name>hi</name>\n  </sub>\n"
+            b"</some_elem>\n")
+        str(model).should_be(
+            "<some_elem>\n  <sub>\n    <name>hi</name>\n  </sub>\n"
+            "</some_elem>\n")
+
+    def test_arguments_override_class_options(self):
+        model = PrettyModel(self.xml)
+        model.to_xml(pretty_print=False, xml_declaration=False).should_be(
+            self.xml.encode('utf-8'))
+        model.to_xml('ascii', 'xml', False, False).should_be(
+            self.xml.encode('utf-8'))
+
+    def test_write(self):
+        output = io.BytesIO()
+        PrettyModel(self.xml).write(output, pretty_print=False)
+        declaration = b"<?xml version='1.0' encoding='UTF-8'?>\n"
+        output.getvalue().should_be(declaration + self.xml.encode('utf-8'))
+
+    def test_write_file_name(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        path = os.path.join(tmpdir, 'model.xml')
+
+        CachedModel(self.xml).write(path)
+        CachedModel.from_file(path).sub_name.should_be('hi')
+
+    def test_memoizes_cached_models(self):
+        model = CachedModel(self.xml, cache=True)
+        model.to_xml().should_be(model.to_xml())
+        (model.to_xml() is model.to_xml()).should_be_true()
+        (str(model) is str(model)).should_be_true()
+
+        model.other = 'thing'
+        ('<other>thing</other>' in str(model)).should_be_true()
+
+    def test_submodel_changes_invalidate(self):
+        model = CachedModel(self.xml, cache=True)
+        sub = model.sub
+        ('hi' in str(model)).should_be_true()
+        ('hi' in str(sub)).should_be_true()
+
+        sub.name = 'bye'
+        ('bye' in str(model)).should_be_true()
+
+        model.sub_name = 'salut'
+        ('salut' in str(sub)).should_be_true()
+
+    def test_list_item_changes_invalidate(self):
+        model = ItemsModel("<some_elem><items><sub><name>a</name></sub>"
+                           "</items></some_elem>", cache=True)
+        fingerprint = model.fingerprint()
+        ('<name>a</name>' in str(model)).should_be_true()
+
+        item = model.items[0]
+        item._owner[0]().should_be(model)
+        item.name = 'b'
+        ('<name>b</name>' in str(model)).should_be_true()
+        (model.fingerprint() != fingerprint).should_be_true()
+
+    def test_invalidate(self):
+        model = CachedModel(self.xml, cache=True)
+        ('hi' in str(model)).should_be_true()
+        model._etree.find('sub/name').text = 'bye'
+        model.invalidate()
+        ('bye' in str(model)).should_be_true()
+
+    def test_uncached_models_are_not_memoized(self):
+        model = CachedModel(self.xml)
+        ('hi' in str(model)).should_be_true()
+        model._etree.find('sub/name').text = 'bye'
+        ('bye' in str(model)).should_be_true()
+
+    def test_canonical(self):
+        first = CachedModel("<some_elem b='1' a=\"2\"><sub/><!-- hi -->"
+                            "</some_elem>")
+        second = CachedModel('<some_elem a="2" b="1"><sub></sub>'
+                             '</some_elem>')
+        first.canonical().should_be(second.canonical())
+        first.canonical().should_be(
+            b'<some_elem a="2" b="1"><sub></sub></some_elem>')
+        canonical = first.canonical(with_comments=True)
+        (b'<!-- hi -->' in canonical).should_be_true()
+
+
+class RecordModel(CachedModel):
+    STRUCTURAL_EQ = True
+
+
+class FieldsRecordModel(RecordModel):
+    FINGERPRINT = 'fields'
+
+
+class TestStructuralEquality(unittest.TestCase):
+    def setUp(self):
+        self.xml = ("<some_elem><sub><name lang='en'>hi</name></sub>"
+                    "</some_elem>")
+        self.same_xml = ('<some_elem><sub><name lang="en">hi</name></sub>'
+                         '<!-- unmapped --></some_elem>')
+
+    def test_fingerprint(self):
+        first = CachedModel(self.xml)
+        second = CachedModel(self.same_xml)
+        first.fingerprint().should_be(second.fingerprint())
+        len(first.fingerprint()).should_be(40)
+
+        second.sub_name = 'bye'
+        (first.fingerprint() != second.fingerprint()).should_be_true()
+
+    def test_fingerprint_relative_namespaces(self):
+        first = CachedModel("<some_elem xmlns:x='rel' x:a='1' b='2'/>")
+        second = CachedModel('<some_elem b="2" x:a="1" xmlns:x="rel">'
+                             '</some_elem>')
+        first.fingerprint().should_be(second.fingerprint())
+
+    def test_fingerprint_is_memoized(self):
+        model = CachedModel(self.xml, cache=True)
+        (model.fingerprint() is model.fingerprint()).should_be_true()
+
+        before = model.fingerprint()
+        model.sub.name = 'bye'
+        (model.fingerprint() != before).should_be_true()
+
+        model.sub.name = 'hi'
+        model.fingerprint().should_be(before)
+
+    def test_fields_fingerprint_ignores_unmapped_content(self):
+        first = FieldsRecordModel(self.xml)
+        second = FieldsRecordModel(self.xml.replace('<sub>', '<sub id="1">'))
+        (first.canonical() != second.canonical()).should_be_true()
+        first.fingerprint().should_be(second.fingerprint())
+
+        second.lang = 'fr'
+        (first.fingerprint() != second.fingerprint()).should_be_true()
+
+    def test_structural_eq(self):
+        first = RecordModel(self.xml)
+        second = RecordModel(self.same_xml)
+        (first == second).should_be_true()
+        (first != second).should_be_false()
+        hash(first).should_be(hash(second))
+        len(set([first, second, RecordModel(self.xml)])).should_be(1)
+
+        second.lang = 'fr'
+        (first == second).should_be_false()
+        (first != second).should_be_true()
+        (first == CachedModel(self.xml)).should_be_false()
+
+    def test_equal_models_keep_separate_state(self):
+        for cache in (False, True):
+            first = RecordModel(self.xml, cache=cache)
+            second = RecordModel(self.xml, cache=cache)
+            first.sub_name.should_be('hi')
+            first.sub.name.should_be('hi')
+
+            second.sub_name = 'bye'
+            first.sub_name.should_be('hi')
+            first.sub.name.should_be('hi')
+            first._etree.find('sub/name').text.should_be('hi')
+            second.sub_name.should_be('bye')
+            second._etree.find('sub/name').text.should_be('bye')
+
+    def test_identity_eq_by_default(self):
+        first = CachedModel(self.xml)
+        (first == CachedModel(self.xml)).should_be_false()
+        (first == CachedModel(first._etree)).should_be_true()
+        len(set([first, CachedModel(self.xml)])).should_be(2)
+
+    def test_unknown_fingerprint(self):
+        class BadModel(CachedModel):
+            FINGERPRINT = 'nodes'
+
+        BadModel(self.xml).fingerprint.should_raise(ValueError)
+
 
 class _TestDescBase(object):
     def make_present(self):
@@ -363,6 +1759,43 @@ class _TestNodeValueListViewBase(_TestDescBase):
         self.make_item_present(self.alternate_value[1])
         len(self.desc.__get__(self.model)).should_be(2)
 
+    def test_view_is_memoized(self):
+        self.make_present()
+        view = self.init_desc
+        self.init_desc.should_be(view)
+
+    def test_memoized_view_sees_other_models(self):
+        self.make_present()
+        self.make_item_present(self.alternate_value[0])
+        list(self.init_desc).should_be(self.alternate_value[:1])
+
+        other = SampleModel(self.model._etree)
+        self.desc.__get__(other)[0] = self.alternate_value[1]
+        list(self.init_desc).should_be(self.alternate_value[1:2])
+
+    def test_memoized_view_does_not_keep_model_alive(self):
+        self.make_present()
+        self.init_desc.should_have_length(0)
+        model_ref = weakref.ref(self.model)
+
+        gc.disable()
+        self.addCleanup(gc.enable)
+        del self.model
+        model_ref().should_be_none()
+
+    def test_view_outlives_model(self):
+        self.make_present()
+        view = self.init_desc
+        model_ref = weakref.ref(self.model)
+
+        gc.disable()
+        self.addCleanup(gc.enable)
+        del self.model
+        model_ref().should_be_none()
+
+        view.append(self.alternate_value[0])
+        list(view).should_be(self.alternate_value[:1])
+
 
 class TestNodeValueListView(_TestNodeValueListViewBase, unittest.TestCase):
     def setUp(self):
@@ -474,6 +1907,128 @@ class TestNodeValueListView(_TestNodeValueListViewBase, unittest.TestCase):
                                                    None).should_be_none()
 
 
+class TestNodeValueListViewIndex(unittest.TestCase):
+    def setUp(self):
+        self.model = SampleModel(cache=True)
+        self.desc = mp.NodeValueListView('food', 'cracker',
+                                         lambda e: e.get('name'),
+                                         lambda v, e: e.set('name', v),
+                                         always_present=True)
+        self.view = self.desc.__get__(self.model)
+        self.food = self.model._etree.find('food')
+        for name in ('ritz', 'triscuit', 'wheat thins'):
+            self.food.append(etree.Element('cracker', name=name))
+            self.food.append(etree.Element('cheese', name=name))
+
+    def names(self):
+        return [e.get('name') for e in self.food.findall('cracker')]
+
+    def test_iterates_with_single_lookup(self):
+        with mock.patch.object(self.desc, '_child_nodes',
+                               wraps=self.desc._child_nodes) as child_nodes:
+            list(self.view).should_be(['ritz', 'triscuit', 'wheat thins'])
+            len(self.view).should_be(3)
+            self.view[1].should_be('triscuit')
+            child_nodes.call_count.should_be(1)
+
+    def test_mutations_keep_index(self):
+        with mock.patch.object(self.desc, '_child_nodes',
+                               wraps=self.desc._child_nodes) as child_nodes:
+            self.view.insert(0, 'saltine')
+            self.view.append('graham')
+            del self.view[1]
+            self.view[0] = 'club'
+            list(self.view).should_be(self.names())
+            child_nodes.call_count.should_be(1)
+
+        self.names().should_be(['club', 'triscuit', 'wheat thins',
+                                'graham'])
+
+    def test_detects_external_changes(self):
+        list(self.view).should_have_length(3)
+        self.food.append(etree.Element('cracker', name='saltine'))
+        list(self.view).should_be(self.names())
+
+    def test_uncached_models_see_replaced_items(self):
+        other = SampleModel(self.model._etree)
+        view = self.desc.__get__(SampleModel(self.model._etree))
+        list(view).should_be(['ritz', 'triscuit', 'wheat thins'])
+
+        self.desc.__get__(other)[0] = 'club'
+        list(view).should_be(['club', 'triscuit', 'wheat thins'])
+
+        self.food.find('cracker').tag = 'cheese'
+        list(view).should_be(['triscuit', 'wheat thins'])
+        len(view).should_be(2)
+
+    def test_invalidate(self):
+        list(self.view).should_have_length(3)
+        self.food.find('cracker').set('name', 'club')
+        self.food.find('cracker').tag = 'cheese'
+        list(self.view).should_have_length(3)
+
+        self.view.invalidate()
+        list(self.view).should_be(['triscuit', 'wheat thins'])
+
+    def test_contains_and_index(self):
+        ('triscuit' in self.view).should_be_true()
+        ('saltine' in self.view).should_be_false()
+        self.view.index('wheat thins').should_be(2)
+        self.view.index.should_raise(ValueError, 'ritz', 1)
+
+    def test_extend(self):
+        self.view.extend(['saltine', 'graham'])
+        self.names().should_be(['ritz', 'triscuit', 'wheat thins',
+                                'saltine', 'graham'])
+        self.food[-3].get('name').should_be('saltine')
+        self.food[-3].tag.should_be('cracker')
+
+    def test_slice_assignment_matches_list(self):
+        expected = ['ritz', 'triscuit', 'wheat thins']
+        for ind, values in [(slice(0, 2), ['a']),
+                            (slice(1, 1), ['b', 'c']),
+                            (slice(None, None, 2), ['d', 'e']),
+                            (slice(-1, None), ['f', 'g', 'h']),
+                            (slice(2, None), [])]:
+            expected[ind] = values
+            self.view[ind] = values
+            self.names().should_be(expected)
+            list(self.view).should_be(expected)
+
+        len(self.food.findall('cheese')).should_be(3)
+
+    def test_bulk_set(self):
+        with mock.patch.object(self.desc, '_actual_index',
+                               wraps=self.desc._actual_index) as act_ind:
+            self.desc.__set__(self.model, ['saltine', 'graham', 'club'])
+            act_ind.call_count.should_be(1)
+
+        self.names().should_be(['saltine', 'graham', 'club'])
+        tags = [e.tag for e in self.food]
+        tags.should_be(['cheese'] * 3 + ['cracker'] * 3)
+
+    def test_bulk_set_from_self(self):
+        self.desc.__set__(self.model, self.view)
+        self.names().should_be(['ritz', 'triscuit', 'wheat thins'])
+
+    def test_bulk_dumps(self):
+        def bulk_dumps(values):
+            bulk_dumps.calls += 1
+            return [etree.Element('cracker', name=v.upper()) for v in values]
+
+        bulk_dumps.calls = 0
+        self.desc._bulk_dumps = bulk_dumps
+
+        self.desc.__set__(self.model, ['saltine', 'graham'])
+        self.view.extend(['club', 'ritz'])
+        bulk_dumps.calls.should_be(2)
+        self.names().should_be(['SALTINE', 'GRAHAM', 'CLUB', 'RITZ'])
+
+    def test_extended_slice_size_mismatch(self):
+        self.view.__setitem__.should_raise(ValueError, slice(None, None, 2),
+                                           ['a'])
+
+
 class TestNodeValueList(_TestNodeValueListViewBase, unittest.TestCase):
     def setUp(self):
         self.model = SampleModel()
@@ -488,12 +2043,27 @@ class TestNodeValueList(_TestNodeValueListViewBase, unittest.TestCase):
     def make_present(self):
         super(TestNodeValueList, self).make_present()
 
+    def test_set_replaces_all_children(self):
+        self.make_present()
+        for name in self.alternate_value:
+            self.make_item_present(name, ind=0)
+
+        self.desc.__set__(self.model, ['swiss'])
+        [e.get('name') for e in self.elem].should_be(['swiss'])
+
     def test_delete_removes_node(self):
         self.make_present()
         self.model._etree.find('food').shouldnt_be_none()
         self.desc.__delete__(self.model)
         self.model._etree.find('food').should_be_none()
 
+    def test_delete_forgets_view(self):
+        self.make_present()
+        view = self.init_desc
+        self.desc.__delete__(self.model)
+        self.desc._always_present = True
+        (self.init_desc is view).should_be_false()
+
     def test_insert(self):
         self.make_present()
         self.make_item_present(self.alternate_value[0])
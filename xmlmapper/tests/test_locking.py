@@ -0,0 +1,106 @@
+import threading
+import unittest
+
+import should_be.all  # noqa
+
+from xmlmapper import locking
+
+
+class TestRWLock(unittest.TestCase):
+    def setUp(self):
+        self.lock = locking.RWLock()
+
+    def start(self, func):
+        thread = threading.Thread(target=func)
+        thread.daemon = True
+        thread.start()
+        self.addCleanup(thread.join, 5)
+        return thread
+
+    def blocked(self, thread):
+        thread.join(0.1)
+        return thread.is_alive()
+
+    def test_readers_share(self):
+        with self.lock.reading():
+            reader = self.start(lambda: self.lock.reading().__enter__())
+            self.blocked(reader).should_be_false()
+
+    def test_writers_exclude_readers(self):
+        with self.lock.writing():
+            reader = self.start(self.lock.acquire_read)
+            self.blocked(reader).should_be_true()
+
+        self.blocked(reader).should_be_false()
+
+    def test_readers_exclude_writers(self):
+        with self.lock.reading():
+            writer = self.start(self.lock.acquire_write)
+            self.blocked(writer).should_be_true()
+
+        self.blocked(writer).should_be_false()
+
+    def test_waiting_writers_block_new_readers(self):
+        done = threading.Event()
+
+        def write():
+            with self.lock.writing():
+                done.wait(5)
+
+        self.lock.acquire_read()
+        writer = self.start(write)
+        self.blocked(writer).should_be_true()
+
+        reader = self.start(self.lock.acquire_read)
+        self.blocked(reader).should_be_true()
+
+        self.lock.release_read()
+        self.blocked(reader).should_be_true()
+
+        done.set()
+        self.blocked(writer).should_be_false()
+        self.blocked(reader).should_be_false()
+
+    def test_reentrant(self):
+        with self.lock.writing():
+            with self.lock.writing():
+                with self.lock.reading():
+                    pass
+
+        with self.lock.reading():
+            with self.lock.reading():
+                pass
+
+        writer = self.start(self.lock.acquire_write)
+        self.blocked(writer).should_be_false()
+
+    def test_cannot_upgrade(self):
+        with self.lock.reading():
+            self.lock.acquire_write.should_raise(RuntimeError)
+
+    def test_can_write(self):
+        self.lock.can_write().should_be_true()
+        with self.lock.reading():
+            self.lock.can_write().should_be_false()
+
+        with self.lock.writing():
+            with self.lock.reading():
+                self.lock.can_write().should_be_true()
+
+    def test_initializing_while_reading(self):
+        with self.lock.reading():
+            with self.lock.initializing():
+                pass
+
+    def test_release_unheld(self):
+        self.lock.release_read.should_raise(RuntimeError)
+        self.lock.release_write.should_raise(RuntimeError)
+
+
+class TestFrozenLock(unittest.TestCase):
+    def test_refuses_writes(self):
+        with locking.FROZEN.reading():
+            pass
+
+        locking.FROZEN.writing.should_raise(TypeError)
+        locking.FROZEN.can_write().should_be_false()
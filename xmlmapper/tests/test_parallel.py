@@ -0,0 +1,97 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from lxml import etree
+import should_be.all  # noqa
+
+import xmlmapper as mp
+from xmlmapper import parallel
+
+
+class ItemModel(mp.Model):
+    ROOT_ELEM = 'item'
+
+    name = mp.NodeValue('name')
+    price = mp.NodeValue('price', loads=float)
+    tags = mp.NodeValueList('tags', lambda e: e.text,
+                            lambda v: etree.Element('tag'))
+
+
+def get_name(model):
+    return model.name
+
+
+def discount(model):
+    model.price = model.price / 2
+    return model
+
+
+class TestMapFiles(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+
+        self.paths = []
+        for ind in range(10):
+            path = os.path.join(self.tmpdir, 'item{0}.xml'.format(ind))
+            with open(path, 'w') as xml_file:
+                xml_file.write("<item><name>item{0}</name>"
+                               "<price>{0}</price><skipped/>"
+                               "<tags><tag>a</tag></tags></item>".format(ind))
+            self.paths.append(path)
+
+    def test_dicts(self):
+        res = list(parallel.map_files(ItemModel, self.paths, workers=2))
+        [path for path, _ in res].should_be(self.paths)
+        res[3][1].should_be({'name': 'item3', 'price': 3.0, 'tags': ['a']})
+
+    def test_fn(self):
+        res = parallel.map_files(ItemModel, self.paths, get_name, workers=2,
+                                 chunksize=3)
+        [name for _, name in res].should_be(
+            ['item{0}'.format(ind) for ind in range(10)])
+
+    def test_fn_returning_models(self):
+        res = parallel.map_files(ItemModel, self.paths[1:2], discount,
+                                 workers=2)
+        [val for _, val in res][0]['price'].should_be(0.5)
+
+    def test_bytes(self):
+        res = dict(parallel.map_files(ItemModel, self.paths, workers=2,
+                                      output='bytes', project=True))
+        ItemModel(etree.fromstring(res[self.paths[2]])).name.should_be(
+            'item2')
+        (b'skipped' in res[self.paths[2]]).should_be_false()
+
+    def test_unordered(self):
+        res = parallel.map_files(ItemModel, iter(self.paths), get_name,
+                                 workers=3, ordered=False)
+        sorted(res).should_be(
+            [(path, 'item{0}'.format(ind))
+             for ind, path in enumerate(self.paths)])
+
+    def test_in_process(self):
+        res = list(parallel.map_files(ItemModel, self.paths, get_name,
+                                      workers=1))
+        res[0].should_be((self.paths[0], 'item0'))
+
+    def test_errors_are_raised(self):
+        with open(self.paths[4], 'w') as xml_file:
+            xml_file.write('<other/>')
+
+        def map_all():
+            return list(parallel.map_files(ItemModel, self.paths,
+                                           workers=2))
+
+        map_all.should_raise(ValueError)
+
+    def test_unknown_output(self):
+        parallel.map_files.should_raise(ValueError, ItemModel, self.paths,
+                                        output='models')
+
+    def test_default_chunksize(self):
+        parallel._default_chunksize(self.paths, 2).should_be(2)
+        parallel._default_chunksize(range(100), 4).should_be(7)
+        parallel._default_chunksize(iter(self.paths), 2).should_be(1)
@@ -0,0 +1,73 @@
+import io
+import threading
+import unittest
+
+import should_be.all  # noqa
+
+import xmlmapper as mp
+from xmlmapper import parsers
+
+
+class BlankTextModel(mp.Model):
+    ROOT_ELEM = 'some_elem'
+    PARSER_OPTIONS = {'remove_blank_text': True}
+
+    name = mp.NodeValue('name')
+
+
+class TestParserPool(unittest.TestCase):
+    def setUp(self):
+        defaults = parsers.default_options()
+        self.addCleanup(lambda: parsers.configure(**defaults))
+        self.addCleanup(parsers.clear)
+
+    def test_reuses_parsers(self):
+        parser = parsers.get_parser({'huge_tree': True})
+        parsers.get_parser({'huge_tree': True}).should_be_exactly(parser)
+        (parsers.get_parser() is parser).should_be_false()
+
+    def test_parsers_are_per_thread(self):
+        parser = parsers.get_parser()
+        other = []
+        thread = threading.Thread(
+            target=lambda: other.append(parsers.get_parser()))
+        thread.start()
+        thread.join()
+
+        (other[0] is parser).should_be_false()
+
+    def test_configure_defaults(self):
+        parsers.configure(remove_comments=True)
+        parsers.parser_options({'huge_tree': True}).should_be(
+            {'remove_comments': True, 'huge_tree': True})
+
+        model = mp.Model('<elem><!-- hi --></elem>')
+        len(model._etree).should_be(0)
+
+    def test_model_parser_options(self):
+        xml = b'<some_elem>\n  <name>hi</name>\n</some_elem>'
+
+        BlankTextModel(xml.decode('ascii'))._etree.text.should_be_none()
+        BlankTextModel.from_bytes(xml)._etree.text.should_be_none()
+
+        plain = mp.Model.from_bytes(xml.replace(b'some_elem', b'elem'))
+        plain._etree.text.shouldnt_be_none()
+
+    def test_iterparse_options(self):
+        xml = io.BytesIO(b'<feed><some_elem>\n<name>hi</name>\n</some_elem>'
+                         b'</feed>')
+
+        model = next(BlankTextModel.iterparse(xml))
+        model._etree.text.should_be_none()
+        model.name.should_be('hi')
+
+    def test_iterparse_skips_unsupported_defaults(self):
+        parsers.configure(ns_clean=True, remove_comments=True)
+        parsers.iterparse_options({'huge_tree': True}).should_be(
+            {'remove_comments': True, 'huge_tree': True})
+
+        xml = io.BytesIO(b'<feed><some_elem><!-- hi --><name>hi</name>'
+                         b'</some_elem></feed>')
+        model = next(BlankTextModel.iterparse(xml))
+        len(model._etree).should_be(1)
+        model.name.should_be('hi')
@@ -13,6 +13,48 @@ class SampleModel(mp.Model):
     name = mp.ROOT.name
 
 
+class TestPathDSL(unittest.TestCase):
+    def test_paths_are_shared(self):
+        first = mp.ROOT.food.cheese['name']
+        second = mp.ROOT.food.cheese['name']
+        first._path.should_be('./food/cheese[@name]')
+        (first._path is second._path).should_be_true()
+        (first is second).should_be_false()
+
+    def test_formatting_copies(self):
+        base = mp.ROOT.food.count
+        as_int = base % (int, str)
+        as_float = base % (float, str)
+
+        (as_int is base).should_be_false()
+        (as_int._raw_loads is int).should_be_true()
+        (as_float._raw_loads is float).should_be_true()
+        (base._raw_loads is int).should_be_false()
+        as_int._path.should_be(base._path)
+
+
+class ItemModel(mp.Model):
+    ROOT_ELEM = 'item'
+
+    name = mp.ROOT.name
+
+
+class MenuModel(mp.Model):
+    ROOT_ELEM = 'menu'
+
+    items = mp.ROOT.items[...].item % ItemModel
+
+
+class TestModelLists(unittest.TestCase):
+    def test_items_are_owned(self):
+        model = MenuModel("<menu><items><item><name>a</name></item>"
+                          "</items></menu>", cache=True)
+        ('<name>a</name>' in str(model)).should_be_true()
+
+        model.items[0].name = 'b'
+        ('<name>b</name>' in str(model)).should_be_true()
+
+
 class _TestDescBase(object):
     def make_present(self):
         self.model._etree.append(self.elem)
@@ -318,6 +360,15 @@ class TestNodeValueList(_TestNodeValueListViewBase, unittest.TestCase):
     def make_present(self):
         super(TestNodeValueList, self).make_present()
 
+    def test_bulk_dumps_option(self):
+        def bulk_dumps(values):
+            return [etree.Element('cheese', name=v) for v in values]
+
+        desc = self.desc % {'bulk_dumps': bulk_dumps}
+        desc._bulk_dumps.should_be(bulk_dumps)
+        desc.__set__(self.model, self.alternate_value)
+        list(desc.__get__(self.model)).should_be(self.alternate_value)
+
     def test_delete_removes_node(self):
         self.make_present()
         self.model._etree.find('food').shouldnt_be_none()
@@ -0,0 +1,74 @@
+import io
+import unittest
+
+from lxml import etree
+import should_be.all  # noqa
+
+import xmlmapper as mp
+
+
+class SampleModel(mp.Model):
+    ROOT_ELEM = 'some_elem'
+
+    name = mp.NodeValue('name')
+
+
+def make_model(name):
+    model = SampleModel()
+    model.name = name
+    return model
+
+
+class TestModelWriter(unittest.TestCase):
+    def setUp(self):
+        self.output = io.BytesIO()
+
+    def test_writes_records_under_root(self):
+        with mp.ModelWriter(self.output, 'feed') as writer:
+            writer.write(make_model('a'))
+            writer.write_all([make_model('b'), make_model('c')])
+
+        writer.count.should_be(3)
+        writer.closed.should_be_true()
+
+        xml = etree.fromstring(self.output.getvalue())
+        xml.tag.should_be('feed')
+        [elem.text for elem in xml.findall('some_elem/name')].should_be(
+            ['a', 'b', 'c'])
+
+    def test_flush_every(self):
+        writer = mp.ModelWriter(self.output, 'feed', xml_declaration=False,
+                                flush_every=2).open()
+        writer.write(make_model('a'))
+        writer.write(make_model('b'))
+
+        self.output.getvalue().should_be(
+            b'<feed><some_elem><name>a</name></some_elem>'
+            b'<some_elem><name>b</name></some_elem>')
+
+        writer.close()
+        self.output.getvalue().endswith(b'</feed>').should_be_true()
+
+    def test_does_not_write_tails(self):
+        doc = etree.fromstring('<doc><some_elem><name>a</name></some_elem>'
+                               'between</doc>')
+        writer = mp.ModelWriter(self.output, 'feed',
+                                xml_declaration=False).open()
+        writer.write(SampleModel(doc[0]))
+        writer.close()
+
+        self.output.getvalue().should_be(
+            b'<feed><some_elem><name>a</name></some_elem></feed>')
+
+    def test_roundtrips_through_iterparse(self):
+        with mp.ModelWriter(self.output, 'feed') as writer:
+            for name in ('a', 'b'):
+                writer.write(make_model(name))
+
+        self.output.seek(0)
+        [m.name for m in SampleModel.iterparse(self.output)].should_be(
+            ['a', 'b'])
+
+    def test_write_after_close_raises(self):
+        writer = mp.ModelWriter(self.output, 'feed')
+        writer.write.should_raise(ValueError, make_model('a'))